@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "polls.querybudget.QueryBudgetMiddleware",
+    "polls.routers.PrimaryPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,9 +57,20 @@ MIDDLEWARE = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "polls.auth.CachedModelBackend",
 ]
 
+# Sessions and the users of requests are read from the cache, falling
+# back to the database. Use a shared cache with several workers, so that
+# logging out or deactivating a user reaches all of them.
+SESSION_ENGINE = config(
+    "SESSION_ENGINE", default="django.contrib.sessions.backends.cached_db"
+)
+# Seconds a user is cached for, 0 loads users from the database
+POLLS_USER_CACHE_TIMEOUT = config(
+    "POLLS_USER_CACHE_TIMEOUT", default=300, cast=int
+)
+
 LOGIN_REDIRECT_URL = "/polls/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
 
@@ -91,11 +104,123 @@ WSGI_APPLICATION = "mysite.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "ENGINE": config(
+            "DATABASE_ENGINE", default="django.db.backends.sqlite3"
+        ),
+        "NAME": config("DATABASE_NAME", default=str(BASE_DIR / "db.sqlite3")),
+        "USER": config("DATABASE_USER", default=""),
+        "PASSWORD": config("DATABASE_PASSWORD", default=""),
+        "HOST": config("DATABASE_HOST", default=""),
+        "PORT": config("DATABASE_PORT", default=""),
+        # Seconds a connection is kept open between requests, 0 closes it
+        # after each request
+        "CONN_MAX_AGE": config("DATABASE_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": config(
+            "DATABASE_CONN_HEALTH_CHECKS", default=True, cast=bool
+        ),
+    }
+}
+
+# Read replicas of the default database, by file name for SQLite or by host
+# for server databases. Reads of polls are spread over them.
+DATABASE_REPLICAS = config(
+    "DATABASE_REPLICAS",
+    default="",
+    cast=lambda val: [s.strip() for s in val.split(",") if s.strip()],
+)
+for i, replica in enumerate(DATABASE_REPLICAS, 1):
+    location = "NAME" if "sqlite3" in DATABASES["default"]["ENGINE"] else "HOST"
+    DATABASES[f"replica{i}"] = {
+        **DATABASES["default"],
+        location: replica,
+        # Tests read replicas from the test database, see test_routers
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["polls.routers.ReplicaRouter"]
+POLLS_READ_REPLICAS = list(DATABASES)[1:]
+
+# Seconds a user reads from the default database after voting, so they see
+# their own vote while replicas catch up
+POLLS_PIN_PRIMARY_SECONDS = config(
+    "POLLS_PIN_PRIMARY_SECONDS", default=10, cast=int
+)
+
+# PRAGMAs run on every new SQLite connection. WAL lets readers run while
+# a vote is written, busy_timeout (ms) makes writers wait for each other.
+SQLITE_PRAGMAS = {
+    "journal_mode": config("SQLITE_JOURNAL_MODE", default="wal"),
+    "synchronous": config("SQLITE_SYNCHRONOUS", default="normal"),
+    "busy_timeout": config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int),
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=134217728, cast=int),
+    # Negative sizes are in KiB
+    "cache_size": config("SQLITE_CACHE_SIZE", default=-20000, cast=int),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Use a shared backend (e.g. Redis, Memcached) when running several workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
     }
 }
 
+# Seconds before cached poll results are recomputed
+POLLS_RESULTS_CACHE_TIMEOUT = config(
+    "POLLS_RESULTS_CACHE_TIMEOUT", default=30, cast=int
+)
+
+# Number of polls on a page of the index, and seconds a page is cached.
+# Pages are invalidated whenever a poll changes, opens or closes.
+POLLS_INDEX_PAGE_SIZE = config("POLLS_INDEX_PAGE_SIZE", default=20, cast=int)
+POLLS_INDEX_CACHE_TIMEOUT = config(
+    "POLLS_INDEX_CACHE_TIMEOUT", default=3600, cast=int
+)
+
+# What to do when a request makes more SQL queries than its view's budget:
+# "warn" logs the queries, "raise" fails the request, "off" skips recording.
+POLLS_QUERY_BUDGET = config(
+    "POLLS_QUERY_BUDGET", default="warn" if DEBUG else "off"
+)
+
+# Use async views for details, results and voting, when served with ASGI
+POLLS_ASYNC_VIEWS = config("POLLS_ASYNC_VIEWS", default=False, cast=bool)
+
+# Live results streams push at most one update per POLLS_STREAM_MIN_INTERVAL
+# seconds, and check for votes of other processes every
+# POLLS_STREAM_POLL_INTERVAL seconds.
+POLLS_STREAM_MIN_INTERVAL = config(
+    "POLLS_STREAM_MIN_INTERVAL", default=1.0, cast=float
+)
+POLLS_STREAM_POLL_INTERVAL = config(
+    "POLLS_STREAM_POLL_INTERVAL", default=5.0, cast=float
+)
+
+# Buffered vote ingestion, votes are logged and written to the database
+# in batches by a background flusher. Each process logs to its own file,
+# POLLS_VOTE_BUFFER_LOG with its pid added (votes.<pid>.log).
+POLLS_VOTE_BUFFER = config("POLLS_VOTE_BUFFER", default=False, cast=bool)
+POLLS_VOTE_BUFFER_LOG = config(
+    "POLLS_VOTE_BUFFER_LOG", default=str(BASE_DIR / "votes.log")
+)
+POLLS_VOTE_BUFFER_BATCH_SIZE = config(
+    "POLLS_VOTE_BUFFER_BATCH_SIZE", default=500, cast=int
+)
+POLLS_VOTE_BUFFER_INTERVAL = config(
+    "POLLS_VOTE_BUFFER_INTERVAL", default=1.0, cast=float
+)
+
+# Directory ballots of old polls are archived to by archive_votes
+POLLS_ARCHIVE_DIR = config(
+    "POLLS_ARCHIVE_DIR", default=str(BASE_DIR / "archive")
+)
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -116,6 +241,20 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+# Passwords are hashed with the first hasher. Accounts imported with
+# import_users --defer-hashing use the provisional one until they log in.
+
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "polls.hashers.ProvisionalPasswordHasher",
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
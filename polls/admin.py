@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Count, OuterRef, Sum
 
-from .models import Question, Choice
+from . import lifecycle
+from .purge import purge_in_background
+from .models import Question, Choice, VoteData, shard_votes
+from .pagination import EstimatedCountPaginator
 
 
 class ChoiceInline(admin.TabularInline):
@@ -13,9 +17,120 @@ class QuestionAdmin(admin.ModelAdmin):
         (None, {"fields": ["question_text"]}),
         ("Visibility", {"fields": ["visibilty"]}),
         ("Date Information", {"fields": ["publish_date", "end_date"]}),
+        ("Vote counting", {"fields": ["counter_shards"]}),
     ]
     inlines = [ChoiceInline]
-    list_display = ("question_text", "visibilty", "publish_date", "end_date")
+    actions = ["publish_polls", "close_polls", "hide_polls", "clone_polls"]
+    list_display = (
+        "question_text",
+        "visibilty",
+        "publish_date",
+        "end_date",
+        "choice_count",
+        "total_votes",
+    )
+
+    def get_queryset(self, request):
+        # Totals come from the choices' vote counters, in the same query
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                choice_count=Count("choice"),
+                total_votes=Sum("choice__vote_count", default=0)
+                + shard_votes(choice__question=OuterRef("pk")),
+            )
+        )
+
+    @admin.display(description="Choices", ordering="choice_count")
+    def choice_count(self, question):
+        return question.choice_count
+
+    @admin.display(description="Votes", ordering="total_votes")
+    def total_votes(self, question):
+        return question.total_votes
+
+    @admin.action(description="Publish selected polls now")
+    def publish_polls(self, request, queryset):
+        queryset = queryset.filter(purging=False)
+        count = lifecycle.publish(queryset)
+        self.message_user(request, f"Published {count} poll(s).")
+        archived = queryset.exclude(ballots_archive="").count()
+        if archived:
+            self.message_user(
+                request,
+                f"Skipped {archived} poll(s) with archived ballots, "
+                "restore them first.",
+                messages.WARNING,
+            )
+
+    @admin.action(description="Close selected polls now")
+    def close_polls(self, request, queryset):
+        count = lifecycle.close(queryset.filter(purging=False))
+        self.message_user(request, f"Closed {count} poll(s).")
+
+    @admin.action(description="Hide selected polls")
+    def hide_polls(self, request, queryset):
+        count = lifecycle.hide(queryset.filter(purging=False))
+        self.message_user(request, f"Hid {count} poll(s).")
+
+    @admin.action(description="Clone selected polls as hidden drafts")
+    def clone_polls(self, request, queryset):
+        copies = lifecycle.clone(queryset.filter(purging=False))
+        self.message_user(request, f"Cloned {len(copies)} poll(s).")
+
+    def get_deleted_objects(self, objs, request):
+        # Listing what a question cascades to would load all its ballots
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        purge_in_background([obj.pk])
+        self.message_user(
+            request, f"“{obj}” is hidden and being deleted in the background."
+        )
+
+    def delete_queryset(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        purge_in_background(ids)
+        self.message_user(
+            request,
+            f"{len(ids)} poll(s) are hidden and being deleted in the "
+            "background.",
+        )
+
+
+class VoteDataAdmin(admin.ModelAdmin):
+    """
+    Read only browsing of votes. Votes are only cast by voting, which
+    keeps the choices' vote counters in sync.
+    """
+
+    list_display = ("id", "user", "question", "choice")
+    list_select_related = ("user", "question", "choice")
+    list_per_page = 100
+    raw_id_fields = ("user", "question", "choice")
+    search_fields = ("user__username",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(VoteData, VoteDataAdmin)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PollsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "polls"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite
+        from .querybudget import install_query_recorder
+
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,220 @@
+"""
+Cold storage of the ballots of old polls.
+
+Ballots (VoteData rows) of polls closed long ago are written to a gzipped
+CSV or JSON Lines file in POLLS_ARCHIVE_DIR, then deleted from the
+database in small batches, each in its own short transaction. Vote
+counters of the choices are recounted first and kept, so results stay
+the same without the ballots.
+
+Archived questions remember their file in Question.ballots_archive, and
+restore() brings their ballots back from it.
+"""
+import csv
+import gzip
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .export import export_rows, iter_lines
+from .models import Choice, ChoiceCounterShard, Question, VoteData
+from .snapshots import refresh_snapshots
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archivable(days, now=None):
+    """Returns questions closed more than days ago, not yet archived"""
+    now = now or timezone.now()
+    return Question.objects.closed().filter(
+        end_date__lt=now - timedelta(days=days), ballots_archive=""
+    )
+
+
+def archive_path(name):
+    return os.path.join(settings.POLLS_ARCHIVE_DIR, name)
+
+
+def write_ballots(question_id, fmt="jsonl", chunk_size=2000):
+    """
+    Writes ballots of a question to a gzipped file in POLLS_ARCHIVE_DIR.
+    Returns (file name, number of ballots, highest ballot id written).
+    """
+    name = f"question-{question_id}.{fmt}.gz"
+    path = archive_path(name)
+    os.makedirs(settings.POLLS_ARCHIVE_DIR, exist_ok=True)
+    header, rows = export_rows(
+        "votes", chunk_size=chunk_size, question=question_id
+    )
+    count = last_id = 0
+
+    def counted(rows):
+        nonlocal count, last_id
+        for row in rows:
+            count += 1
+            last_id = row[0]
+            yield row
+
+    # Written aside first, a file named after the question is complete
+    with gzip.open(f"{path}.part", "wt", encoding="utf-8", newline="") as f:
+        for line in iter_lines(header, counted(rows), fmt):
+            f.write(line)
+    os.replace(f"{path}.part", path)
+    return name, count, last_id
+
+
+def delete_ballots(question_id, batch_size=1000, up_to=None, progress=None):
+    """
+    Deletes ballots of a question, up to ballot id up_to, batch_size
+    rows per transaction. Returns the number of ballots deleted.
+
+    :param progress: called with the number deleted so far after each
+        batch
+    """
+    ballots = VoteData.objects.filter(question_id=question_id)
+    if up_to is not None:
+        ballots = ballots.filter(pk__lte=up_to)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                ballots.order_by("pk").values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not ids:
+                return deleted
+            # Ballots have no dependents or signals, so this is a single
+            # DELETE without loading them
+            deleted += VoteData.objects.filter(pk__in=ids).delete()[0]
+        if progress is not None:
+            progress(deleted)
+
+
+def recount(question_id):
+    """
+    Sets vote counters of the choices of a question from its ballots and
+    removes their counter shards
+    """
+    counts = dict(
+        VoteData.objects.filter(question_id=question_id)
+        .values_list("choice")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    choices = list(Choice.objects.filter(question_id=question_id))
+    for choice in choices:
+        choice.vote_count = counts.get(choice.pk, 0)
+    Choice.objects.bulk_update(choices, ["vote_count"])
+    ChoiceCounterShard.objects.filter(choice__in=choices).delete()
+
+
+def archive(question, fmt="jsonl", batch_size=1000, chunk_size=2000):
+    """
+    Archives ballots of a closed question, see the module docstring.
+    Returns the number of ballots archived.
+
+    :param fmt: "jsonl" or "csv"
+    :param batch_size: ballots deleted per transaction
+    :param chunk_size: ballots read from the database at a time
+    """
+    if not question.ballots_archive:
+        if question.can_vote():
+            raise ArchiveError(f"Question {question.pk} is open for voting")
+        name, count, last_id = write_ballots(question.pk, fmt, chunk_size)
+        with transaction.atomic():
+            recount(question.pk)
+            Question.objects.filter(pk=question.pk).update(
+                ballots_archive=name
+            )
+            refresh_snapshots([question.pk])
+        question.ballots_archive = name
+        delete_ballots(question.pk, batch_size, up_to=last_id)
+        return count
+    # Interrupted before every archived ballot was deleted
+    delete_ballots(question.pk, batch_size)
+    return 0
+
+
+def read_ballots(path):
+    """Yields (vote id, choice id, user id) of the ballots of an archive"""
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv.gz"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield (
+                int(row["vote_id"]),
+                int(row["choice_id"]),
+                int(row["user_id"]),
+            )
+
+
+def restore(question, batch_size=1000):
+    """
+    Brings back the archived ballots of a question. Ballots of users or
+    choices deleted since, or of users who have a ballot on the question
+    again, are skipped and vote counters recounted to match. Returns the
+    number of ballots restored.
+    """
+    if not question.ballots_archive:
+        raise ArchiveError(f"Question {question.pk} is not archived")
+    path = archive_path(question.ballots_archive)
+    if not os.path.exists(path):
+        raise ArchiveError(f"Archive {path} is missing")
+    choices = set(
+        Choice.objects.filter(question=question).values_list("pk", flat=True)
+    )
+    restored = 0
+    batch = []
+    for ballot in read_ballots(path):
+        batch.append(ballot)
+        if len(batch) >= batch_size:
+            restored += _restore_batch(question.pk, batch, choices)
+            batch = []
+    restored += _restore_batch(question.pk, batch, choices)
+    with transaction.atomic():
+        recount(question.pk)
+        Question.objects.filter(pk=question.pk).update(ballots_archive="")
+        refresh_snapshots([question.pk])
+    question.ballots_archive = ""
+    return restored
+
+
+def _restore_batch(question_id, batch, choices):
+    """Inserts the ballots of batch that can be, returns how many"""
+    user_ids = {user_id for _, _, user_id in batch}
+    users = set(
+        User.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    )
+    # Ballots restored by an interrupted run, or cast again since
+    existing = VoteData.objects.filter(
+        Q(pk__in=[pk for pk, _, _ in batch])
+        | Q(question_id=question_id, user__in=user_ids)
+    ).values_list("pk", "question_id", "user_id")
+    taken_pks = set()
+    voted = set()
+    for pk, ballot_question_id, user_id in existing:
+        taken_pks.add(pk)
+        if ballot_question_id == question_id:
+            voted.add(user_id)
+    ballots = [
+        VoteData(
+            pk=pk, question_id=question_id, choice_id=choice_id, user_id=user
+        )
+        for pk, choice_id, user in batch
+        if choice_id in choices
+        and user in users
+        and pk not in taken_pks
+        and user not in voted
+    ]
+    with transaction.atomic():
+        VoteData.objects.bulk_create(ballots)
+    return len(ballots)
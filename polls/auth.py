@@ -0,0 +1,67 @@
+"""
+Cached user lookups.
+
+AuthenticationMiddleware loads the user of every request from the
+database. CachedModelBackend keeps a slim projection of users in the
+cache instead, with only the fields requests need. Other fields are
+loaded from the database when first accessed.
+
+Cached users are invalidated when they are saved or deleted, which
+covers password changes and deactivation, and when they log out, see
+polls.signals. Changes made with QuerySet.update() are seen after
+POLLS_USER_CACHE_TIMEOUT seconds.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Fields of a cached user: what the templates, permission checks and
+# session verification (the password hash) use
+USER_FIELDS = {
+    "id",
+    "password",
+    "username",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+}
+
+
+def user_key(user_id):
+    return f"polls:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend getting users of sessions from the cache"""
+
+    def get_user(self, user_id):
+        timeout = settings.POLLS_USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        User = get_user_model()
+        # In model order, as Model.from_db() expects them
+        fields = [
+            f.attname
+            for f in User._meta.concrete_fields
+            if f.attname in USER_FIELDS
+        ]
+        key = user_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = (
+                User._default_manager.filter(pk=user_id)
+                .values_list(*fields)
+                .first()
+            )
+            if values is None:
+                return None
+            cache.set(key, values, timeout)
+        # A deferred instance, its other fields load on first access
+        user = User.from_db(DEFAULT_DB_ALIAS, fields, values)
+        return user if self.user_can_authenticate(user) else None
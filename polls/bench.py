@@ -0,0 +1,99 @@
+"""Helpers for benchmarking the polls app"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(samples, p):
+    """Returns the p-th percentile of sorted samples (nearest rank)"""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, round(p / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Returns throughput and latency percentiles in milliseconds
+
+    :param latencies: seconds taken by each request
+    :param elapsed: seconds taken by the whole run
+    :param errors: number of requests that raised an error
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def run_threaded(request, total, concurrency):
+    """
+    Calls request() total times from concurrency threads, as a threaded
+    WSGI server would.
+    """
+
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            request()
+        except Exception:
+            return None  # e.g. "database is locked" under write load
+        finally:
+            # As after a request, honouring CONN_MAX_AGE
+            close_old_connections()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    latencies = [r for r in results if r is not None]
+    return summarize(
+        latencies, time.perf_counter() - start, len(results) - len(latencies)
+    )
+
+
+async def run_async(request, total, concurrency):
+    """
+    Awaits request() total times with at most concurrency in flight,
+    as an ASGI server would.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await request()
+            except Exception:
+                return None
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(total)))
+    latencies = [r for r in results if r is not None]
+    return summarize(
+        latencies, time.perf_counter() - start, len(results) - len(latencies)
+    )
+
+
+def count_queries(request):
+    """Returns number of SQL queries made by request()"""
+    with CaptureQueriesContext(connection) as ctx:
+        request()
+    return len(ctx.captured_queries)
+
+
+def client_settings():
+    """Settings letting the test clients reach views outside of tests"""
+    return override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+    )
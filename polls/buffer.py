@@ -0,0 +1,368 @@
+"""
+Buffered vote ingestion.
+
+When POLLS_VOTE_BUFFER is enabled, the vote view appends ballots to an
+append-only log and an in-process queue instead of writing them to the
+database. A background flusher coalesces repeated votes of a user on the
+same question into the last one and writes them in batches.
+
+Votes in the log are replayed when the process restarts, so an
+acknowledged vote is never lost. Each process logs to its own file,
+POLLS_VOTE_BUFFER_LOG with its pid added, and adopts the logs left by
+processes that died before flushing them.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, models, transaction
+from .events import notify_results_changed
+from .models import Choice, VoteData
+
+logger = logging.getLogger(__name__)
+
+
+def write_votes(votes, batch_size):
+    """
+    Writes votes into database, in transactions of batch_size votes.
+
+    :param votes: dict of (user_id, question_id) to choice_id
+    :param batch_size: number of votes written per transaction
+    """
+    items = list(votes.items())
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        try:
+            with transaction.atomic():
+                _write_batch(batch)
+        except IntegrityError:
+            # A user or choice of the batch is gone, write votes one by one
+            # so that only the broken ones are dropped.
+            for (user_id, question_id), choice_id in batch.items():
+                try:
+                    with transaction.atomic():
+                        _write_batch({(user_id, question_id): choice_id})
+                except IntegrityError:
+                    logger.warning(
+                        "Dropped buffered vote of user %s for choice %s",
+                        user_id,
+                        choice_id,
+                    )
+    notify_results_changed(*{question_id for _, question_id in votes})
+
+
+def _write_batch(batch):
+    batch = _valid_votes(batch)
+    previous = {
+        (user_id, question_id): choice_id
+        for user_id, question_id, choice_id in VoteData.objects.filter(
+            user_id__in={user_id for user_id, _ in batch},
+            question_id__in={question_id for _, question_id in batch},
+        ).values_list("user_id", "question_id", "choice_id")
+    }
+    deltas = defaultdict(int)
+    rows = []
+    for key, choice_id in batch.items():
+        old_choice_id = previous.get(key)
+        if old_choice_id == choice_id:
+            continue
+        if old_choice_id is not None:
+            deltas[old_choice_id] -= 1
+        deltas[choice_id] += 1
+        user_id, question_id = key
+        rows.append(
+            VoteData(
+                user_id=user_id, question_id=question_id, choice_id=choice_id
+            )
+        )
+    VoteData.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "question"],
+        update_fields=["choice"],
+    )
+    # Choices sharing the same delta are updated in one statement
+    by_delta = defaultdict(list)
+    for choice_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(choice_id)
+    for delta, choice_ids in by_delta.items():
+        Choice.objects.filter(pk__in=choice_ids).update(
+            vote_count=models.F("vote_count") + delta
+        )
+
+
+def _valid_votes(batch):
+    """Drops votes whose user or choice were removed after voting"""
+    choices = set(
+        Choice.objects.filter(pk__in=set(batch.values())).values_list(
+            "pk", "question_id"
+        )
+    )
+    users = set(
+        User.objects.filter(
+            pk__in={user_id for user_id, _ in batch}
+        ).values_list("pk", flat=True)
+    )
+    valid = {}
+    for (user_id, question_id), choice_id in batch.items():
+        if user_id in users and (choice_id, question_id) in choices:
+            valid[(user_id, question_id)] = choice_id
+        else:
+            logger.warning(
+                "Dropped buffered vote of user %s for choice %s",
+                user_id,
+                choice_id,
+            )
+    return valid
+
+
+def process_log_path(log_path, pid=None):
+    """Returns the log of process pid (this one by default)"""
+    path = Path(log_path)
+    return path.with_name(f"{path.stem}.{pid or os.getpid()}{path.suffix}")
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Alive, but another user's
+        return True
+    return True
+
+
+def orphaned_logs(log_path):
+    """
+    Returns the logs and flushing files of processes that are no longer
+    running, including a log shared by every process in older versions.
+    Files of a process come in the order its votes were logged, flushing
+    file first, so that adopting them keeps the last vote of each user.
+    """
+    path = Path(log_path)
+    pattern = re.compile(
+        rf"{re.escape(path.stem)}\.(\d+){re.escape(path.suffix)}(\..+)?"
+    )
+    orphans = [
+        p
+        for p in (path.with_name(path.name + ".flushing"), path)
+        if p.exists()
+    ]
+    by_pid = defaultdict(list)
+    for candidate in path.parent.glob(f"{path.stem}.*"):
+        match = pattern.fullmatch(candidate.name)
+        if match is None:
+            continue
+        pid = int(match[1])
+        if pid != os.getpid() and not _is_alive(pid):
+            # Flushing file, then log, then files it was adopting
+            order = {".flushing": 0, None: 1}.get(match[2], 2)
+            by_pid[pid].append((order, candidate.name))
+    for pid in sorted(by_pid):
+        orphans.extend(path.with_name(name) for _, name in sorted(by_pid[pid]))
+    return orphans
+
+
+class VoteBuffer:
+    """
+    Queue of votes waiting to be written, backed by an append-only log.
+
+    :param log_path: path of the append-only log
+    :param batch_size: votes that trigger a flush, and written per batch
+    :param interval: seconds between periodic flushes
+    """
+
+    def __init__(self, log_path, batch_size=500, interval=1.0):
+        self.log_path = Path(log_path)
+        self.flushing_path = self.log_path.with_name(
+            self.log_path.name + ".flushing"
+        )
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pending = {}
+        self._in_flight = {}  # Votes being written by a flush
+        self._replay()
+
+    def _replay(self):
+        """Loads votes that were logged but not flushed before a restart"""
+        for path in (self.flushing_path, self.log_path):
+            if not path.exists():
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        user_id, question_id, choice_id = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write of a vote never acknowledged
+                    self._pending[(user_id, question_id)] = choice_id
+
+    def adopt(self, paths):
+        """
+        Takes over the votes logged in paths by other processes, which
+        are moved into this buffer's log and queued
+        """
+        for i, path in enumerate(paths):
+            claimed = self.log_path.with_name(
+                f"{self.log_path.name}.adopted{i}"
+            )
+            try:
+                # Whoever renames it first adopts it
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed) as f:
+                lines = f.readlines()
+            with self._lock:
+                with open(self.log_path, "a") as f:
+                    for line in lines:
+                        try:
+                            user_id, question_id, choice_id = json.loads(line)
+                        except ValueError:
+                            continue
+                        f.write(line if line.endswith("\n") else line + "\n")
+                        self._pending[(user_id, question_id)] = choice_id
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.remove(claimed)
+            logger.info("Adopted buffered votes of %s", path)
+
+    def add(self, user_id, question_id, choice_id):
+        """Logs a vote and queues it for the next flush"""
+        with self._lock:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps([user_id, question_id, choice_id]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending[(user_id, question_id)] = choice_id
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def pending_choice(self, user_id, question_id):
+        """Returns id of the choice a user voted for if not flushed yet"""
+        key = (user_id, question_id)
+        return self._pending.get(key, self._in_flight.get(key))
+
+    def with_pending_vote(self, results, user_id, question_id):
+        """
+        Returns results of a question with the vote of a user not flushed
+        yet counted in place of the one written before, if any
+
+        :param results: total votes and rows of choices, as returned by
+            polls.results.get_results
+        """
+        choice_id = self.pending_choice(user_id, question_id)
+        if choice_id is None:
+            return results
+        previous = (
+            VoteData.objects.filter(user_id=user_id, question_id=question_id)
+            .values_list("choice_id", flat=True)
+            .first()
+        )
+        if previous == choice_id:
+            return results
+        total = results["total_votes"] + (previous is None)
+        rows = []
+        for row in results["results"]:
+            votes = (
+                row["votes"]
+                + (row["id"] == choice_id)
+                - (row["id"] == previous)
+            )
+            rows.append(
+                {
+                    **row,
+                    "votes": votes,
+                    "percentage": votes / total * 100 if total else 0,
+                }
+            )
+        return {**results, "total_votes": total, "results": rows}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _rotate_log(self):
+        """Moves the log into the flushing file, appending if it exists"""
+        if not self.log_path.exists():
+            return
+        if not self.flushing_path.exists():
+            os.replace(self.log_path, self.flushing_path)
+            return
+        with open(self.flushing_path, "a") as dst, open(self.log_path) as src:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.log_path)
+
+    def flush(self):
+        """Writes all queued votes into database, returns their count"""
+        with self._flush_lock:
+            with self._lock:
+                votes = self._pending
+                self._in_flight = votes
+                self._pending = {}
+                self._rotate_log()
+            if not votes:
+                return 0
+            try:
+                write_votes(votes, self.batch_size)
+            except Exception:
+                with self._lock:
+                    votes.update(self._pending)
+                    self._pending = votes
+                raise
+            finally:
+                self._in_flight = {}
+            if self.flushing_path.exists():
+                os.remove(self.flushing_path)
+            return len(votes)
+
+    def start(self):
+        """Starts the background flusher if it is not running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="vote-buffer-flusher", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush buffered votes")
+            finally:
+                connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Returns the vote buffer of this process, starting it on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                process_log_path(settings.POLLS_VOTE_BUFFER_LOG),
+                settings.POLLS_VOTE_BUFFER_BATCH_SIZE,
+                settings.POLLS_VOTE_BUFFER_INTERVAL,
+            )
+            _buffer.adopt(orphaned_logs(settings.POLLS_VOTE_BUFFER_LOG))
+            _buffer.start()
+    return _buffer
@@ -0,0 +1,115 @@
+"""
+Cache helpers for the polls app.
+
+Cached values are keyed on a version number that is bumped whenever the
+underlying data changes, instead of deleting every cached key. Expired or
+outdated entries are recomputed by a single worker while the others keep
+serving the stale value.
+"""
+import time
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 10  # seconds a worker may hold a recompute lock
+INDEX_VERSION_KEY = "polls:index:version"
+
+
+def results_version_key(question_id):
+    return f"polls:results:version:{question_id}"
+
+
+def get_version(key):
+    """
+    Returns current version stored in key. A missing version starts from
+    the current time, so an evicted counter never repeats an old version.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Increments version stored in key, invalidating values cached on it"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def get_results_version(question_id):
+    return get_version(results_version_key(question_id))
+
+
+def bump_results_version(question_id):
+    return bump_version(results_version_key(question_id))
+
+
+def bump_results_versions(question_ids):
+    """
+    Bumps results versions of many questions with one read and one write
+    of the cache. Versions move to the current time, which is past any
+    version counted up from an earlier time by bump_version().
+    """
+    keys = [results_version_key(pk) for pk in question_ids]
+    versions = cache.get_many(keys)
+    now = time.time_ns()
+    cache.set_many(
+        {key: max(versions.get(key, 0) + 1, now) for key in keys}, None
+    )
+
+
+def get_index_version():
+    return get_version(INDEX_VERSION_KEY)
+
+
+def bump_index_version():
+    return bump_version(INDEX_VERSION_KEY)
+
+
+def get_or_recompute(key, version, compute, timeout):
+    """
+    Returns value cached in key if it is still fresh for version,
+    otherwise recompute it with compute(). The version the returned value
+    was computed for is returned along with it.
+
+    When an entry is expired, only the worker that acquires the lock
+    recomputes it; the others return the stale value meanwhile.
+
+    :param key: cache key of the entry
+    :param version: version the entry must have been computed for
+    :param compute: function that produces the value
+    :param timeout: seconds an entry stays fresh, None for as long as
+        version is current
+    """
+    entry = cache.get(key)
+    if (
+        entry is not None
+        and entry["version"] == version
+        and (entry["expires"] is None or entry["expires"] > time.time())
+    ):
+        return entry["value"], entry["version"]
+
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked and entry is not None:
+        # Someone else is recomputing
+        return entry["value"], entry["version"]
+    try:
+        value = compute()
+        # Kept past its expiry so it can be served stale while recomputing
+        cache.set(
+            key,
+            {
+                "version": version,
+                "expires": None if timeout is None else time.time() + timeout,
+                "value": value,
+            },
+            None,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value, version
@@ -0,0 +1,12 @@
+"""Tuning of database connections"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Runs SQLITE_PRAGMAS on new SQLite connections"""
+    if connection.vendor != "sqlite":
+        return
+    # On the raw connection, so they are not counted as queries of the
+    # request that opened it
+    for pragma, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {pragma} = {value}")
@@ -0,0 +1,28 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+async def aget_user(request):
+    """Returns the user of a request without blocking the event loop"""
+    if hasattr(request, "auser"):  # Django 5.0+
+        return await request.auser()
+
+    def load_user():
+        request.user.is_authenticated  # Evaluates the lazy user
+        return request.user
+
+    return await sync_to_async(load_user)()
+
+
+def alogin_required(view_func):
+    """Async version of login_required for async views"""
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
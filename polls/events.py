@@ -0,0 +1,163 @@
+"""
+Live poll results.
+
+Votes publish the question they changed to an in-process bus. Streams of
+Server-Sent Events wait on the bus (or poll the results version in the
+shared cache, for votes cast by other processes) and push the choices
+whose counts changed, no faster than POLLS_STREAM_MIN_INTERVAL.
+
+Streams need an ASGI server. Under WSGI a stream would hold a worker, so
+a single event is sent instead, see results_event().
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .cache import (
+    bump_results_version,
+    bump_results_versions,
+    get_results_version,
+)
+from .results import get_versioned_results
+
+
+class Subscription:
+    """A subscriber of a question, woken up when its results change"""
+
+    def __init__(self, question_id, loop):
+        self.question_id = question_id
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        # Publishers may run in any thread, the event is set on its loop.
+        # Many notifications before the subscriber wakes up coalesce.
+        self.loop.call_soon_threadsafe(self.changed.set)
+
+    async def wait(self, timeout):
+        """Waits for a change, returns False if timeout passed first"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+class ResultsBus:
+    """In-process publish/subscribe of results changes per question"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, question_id):
+        """Subscribes the running event loop to a question"""
+        sub = Subscription(question_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[question_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.question_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.question_id]
+
+    def publish(self, question_id):
+        with self._lock:
+            subs = list(self._subscribers.get(question_id, ()))
+        for sub in subs:
+            sub.notify()
+
+    def subscriber_count(self, question_id):
+        with self._lock:
+            return len(self._subscribers.get(question_id, ()))
+
+
+results_bus = ResultsBus()
+
+
+def notify_results_changed(*question_ids):
+    """
+    Invalidates cached results of questions and wakes up their streams.
+    Versions of several questions are bumped with a single cache write.
+    """
+    if len(question_ids) == 1:
+        bump_results_version(question_ids[0])
+    else:
+        bump_results_versions(question_ids)
+    for question_id in question_ids:
+        results_bus.publish(question_id)
+
+
+def format_event(version, payload):
+    return (
+        f"id: {version}\nevent: results\n"
+        f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+    )
+
+
+def results_event(question_id, closed=False, retry=None):
+    """
+    Returns a Server-Sent Event with every choice of a question.
+
+    :param closed: whether the question is closed, see stream_results
+    :param retry: seconds clients wait before reconnecting, if given
+    """
+    data, served = get_versioned_results(question_id, closed)
+    payload = {
+        "total_votes": data["total_votes"],
+        "choices": {str(row["id"]): row["votes"] for row in data["results"]},
+    }
+    event = format_event(served, payload)
+    if retry is not None:
+        event = f"retry: {int(retry * 1000)}\n{event}"
+    return event
+
+
+async def stream_results(question_id, closed=False, bus=results_bus):
+    """
+    Yields Server-Sent Events with results of a question. The first event
+    has every choice, the following ones only the choices that changed.
+    Event ids are results versions, which only increase.
+
+    :param closed: whether the question is closed, its results are then
+        read from its snapshot
+    """
+    sub = bus.subscribe(question_id)
+    sent = {}
+    sent_version = None
+    try:
+        while True:
+            version = await sync_to_async(get_results_version)(question_id)
+            if version != sent_version:
+                data, served = await sync_to_async(get_versioned_results)(
+                    question_id, closed
+                )
+                changed = {
+                    str(row["id"]): row["votes"]
+                    for row in data["results"]
+                    if sent.get(str(row["id"])) != row["votes"]
+                }
+                if sent_version is None or changed:
+                    payload = {
+                        "total_votes": data["total_votes"],
+                        "choices": changed,
+                    }
+                    yield format_event(served, payload)
+                    sent.update(changed)
+                sent_version = served
+                await asyncio.sleep(settings.POLLS_STREAM_MIN_INTERVAL)
+                if served != version:
+                    continue  # Stale results were served, check again
+            if not await sub.wait(settings.POLLS_STREAM_POLL_INTERVAL):
+                # Nothing published here, the version check above catches
+                # votes of other processes. Keeps the connection alive too.
+                yield ": keepalive\n\n"
+    finally:
+        bus.unsubscribe(sub)
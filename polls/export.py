@@ -0,0 +1,142 @@
+"""
+Streaming export of raw votes and per-choice results.
+
+Rows are read with values_list() and iterator(), joined with their user,
+choice and question in the same query, and written out one at a time as
+CSV or JSON Lines. Memory stays bounded whatever the number of votes.
+"""
+import csv
+import json
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Choice, Question, VoteData
+
+FORMATS = ("csv", "jsonl")
+STATES = ("open", "closed", "unpublished")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+VOTE_FIELDS = {
+    "vote_id": "pk",
+    "question_id": "question_id",
+    "question_text": "question__question_text",
+    "choice_id": "choice_id",
+    "choice_text": "choice__choice_text",
+    "user_id": "user_id",
+    "username": "user__username",
+}
+RESULT_FIELDS = {
+    "question_id": "question_id",
+    "question_text": "question__question_text",
+    "choice_id": "pk",
+    "choice_text": "choice_text",
+    "votes": "votes",
+}
+EXPORTS = {"votes": VOTE_FIELDS, "results": RESULT_FIELDS}
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def parse_when(value, end=False):
+    """
+    Parses a date or date and time filter. A date alone means the start
+    of that day, or its end when end is set.
+    """
+    if not value:
+        return None
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise InvalidFilter(f"Not a date: {value!r}")
+        when = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def filter_questions(question=None, since=None, until=None, state=None):
+    """
+    Returns the questions to export.
+
+    :param question: primary key id of a single question
+    :param since: questions published from this date and time
+    :param until: questions published up to this date and time
+    :param state: "open", "closed" or "unpublished"
+
+    Votes have no timestamp, so the date range applies to the publish
+    date of their question.
+    """
+    questions = Question.objects.all()
+    if state == "open":
+        questions = questions.open_for_voting()
+    elif state == "closed":
+        questions = questions.closed()
+    elif state == "unpublished":
+        questions = questions.exclude(pk__in=Question.objects.published())
+    elif state is not None:
+        raise InvalidFilter(f"Unknown poll state: {state!r}")
+    if question is not None:
+        questions = questions.filter(pk=question)
+    if since is not None:
+        questions = questions.filter(publish_date__gte=since)
+    if until is not None:
+        questions = questions.filter(publish_date__lte=until)
+    return questions
+
+
+def export_rows(kind, chunk_size=2000, **filters):
+    """
+    Returns (header, rows) of an export, rows being a lazy iterator of
+    tuples read chunk_size at a time.
+
+    :param kind: "votes" for raw ballots, "results" for vote counts
+    :param filters: see filter_questions()
+    """
+    fields = EXPORTS[kind]
+    model = VoteData if kind == "votes" else Choice
+    questions = filter_questions(**filters)
+    queryset = model.objects.filter(question__in=questions)
+    if kind == "results":
+        queryset = queryset.with_votes()
+    rows = (
+        queryset
+        .order_by("question_id", "pk")
+        .values_list(*fields.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    return list(fields), rows
+
+
+class _Echo:
+    """File-like object returning what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_lines(header, rows, fmt):
+    """
+    Returns a lazy iterator of the lines of an export, in CSV ("csv") or
+    JSON Lines ("jsonl") format
+    """
+    if fmt not in FORMATS:
+        raise InvalidFilter(f"Unknown format: {fmt!r}")
+    if fmt == "csv":
+        return _iter_csv(header, rows)
+    return _iter_jsonl(header, rows)
+
+
+def _iter_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _iter_jsonl(header, rows):
+    for row in rows:
+        record = dict(zip(header, row))
+        yield json.dumps(record, separators=(",", ":")) + "\n"
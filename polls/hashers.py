@@ -0,0 +1,15 @@
+"""Password hashers of the polls app"""
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ProvisionalPasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with a single iteration, for passwords of accounts imported
+    with import_users --defer-hashing. It is not the preferred hasher, so
+    a password is hashed again with the preferred one when its user
+    first logs in. Until then, it is barely safer than the roster it
+    came from.
+    """
+
+    algorithm = "pbkdf2_sha256_provisional"
+    iterations = 1
@@ -0,0 +1,37 @@
+"""
+Reading of CSV and JSON Lines files for the import commands.
+
+Rows are read lazily, one at a time, so files of any size can be
+imported in batches. Rows that can't be read are yielded as RowError
+instead of stopping the import, to be reported with their line number.
+"""
+import csv
+import json
+
+FORMATS = ("csv", "jsonl")
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(f, fmt):
+    """
+    Yields (line number, row) of a CSV or JSONL file, lazily. CSV rows
+    keep their choices in one column, separated by "|".
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = RowError(f"invalid JSON, {e}")
+        if not isinstance(row, (dict, RowError)):
+            row = RowError("expected a JSON object")
+        yield line_num, row
@@ -0,0 +1,153 @@
+"""
+Bulk lifecycle operations on polls.
+
+Each operation changes a whole selection of questions with a single
+UPDATE (or a few bulk INSERTs when cloning) in one transaction, then
+invalidates the cached index once, after the transaction commits.
+Querysets are updated directly, so no save signals are sent, and the
+status of questions is set in the same UPDATE. Result snapshots of the
+questions are taken or removed in the same transaction, see
+polls.snapshots. Questions being purged are left alone, see polls.purge.
+
+advance() moves questions to their next status once their publish or
+end date has passed, see the advance_polls command.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+from .cache import bump_index_version
+from .models import Choice, Question, Status, status_expression
+from .snapshots import refresh_snapshots
+
+
+def _changed():
+    transaction.on_commit(bump_index_version)
+
+
+def publish(queryset, when=None):
+    """
+    Makes questions visible and open for voting from when (now by
+    default). Hidden questions are published from when, questions already
+    visible keep their publish date unless when is earlier, and questions
+    that ended are reopened. Questions with archived ballots are left
+    alone until restored, see polls.archive. Returns number of questions.
+    """
+    now = timezone.now()
+    when = when or now
+    publish_date = Case(
+        When(visibilty=False, then=Value(when)),
+        default=Least(F("publish_date"), Value(when)),
+    )
+    end_date = Case(When(end_date__lt=when, then=None), default=F("end_date"))
+    with transaction.atomic():
+        ids = list(
+            queryset.filter(ballots_archive="", purging=False).values_list(
+                "pk", flat=True
+            )
+        )
+        count = Question.objects.filter(pk__in=ids).update(
+            visibilty=True,
+            publish_date=publish_date,
+            end_date=end_date,
+            status=status_expression(
+                now,
+                visibilty=Value(True),
+                publish_date=publish_date,
+                end_date=end_date,
+            ),
+        )
+        refresh_snapshots(ids)
+        _changed()
+    return count
+
+
+def close(queryset, when=None):
+    """
+    Ends voting on questions at when (now by default). Questions that
+    already ended keep their end date. Returns number of questions.
+    """
+    now = timezone.now()
+    when = when or now
+    if when <= now:
+        # Closed from now on, not only once when has passed
+        status = Case(
+            When(visibilty=False, then=Value(Status.HIDDEN)),
+            When(publish_date__gt=now, then=Value(Status.SCHEDULED)),
+            default=Value(Status.CLOSED),
+        )
+    else:
+        status = status_expression(now, end_date=Value(when))
+    with transaction.atomic():
+        ids = list(
+            queryset.filter(
+                Q(end_date__isnull=True) | Q(end_date__gt=when),
+                purging=False,
+            ).values_list("pk", flat=True)
+        )
+        count = Question.objects.filter(pk__in=ids).update(
+            end_date=when, status=status
+        )
+        refresh_snapshots(ids)
+        _changed()
+    return count
+
+
+def hide(queryset):
+    """Hides questions from users, returns number of questions"""
+    with transaction.atomic():
+        ids = list(queryset.filter(purging=False).values_list("pk", flat=True))
+        count = Question.objects.filter(pk__in=ids).update(
+            visibilty=False, status=Status.HIDDEN
+        )
+        refresh_snapshots(ids)
+        _changed()
+    return count
+
+
+def clone(queryset, publish_date=None):
+    """
+    Copies questions with their choices, without votes. Copies are hidden
+    until published, and are published from publish_date (now by
+    default) without an end date. Returns the new questions.
+    """
+    publish_date = publish_date or timezone.now()
+    with transaction.atomic():
+        originals = list(
+            queryset.filter(purging=False)
+            .order_by("pk").values_list("pk", "question_text")
+        )
+        copies = Question.objects.bulk_create(
+            Question(
+                question_text=text,
+                publish_date=publish_date,
+                visibilty=False,
+                status=Status.HIDDEN,
+            )
+            for _, text in originals
+        )
+        copy_of = {pk: copy.pk for (pk, _), copy in zip(originals, copies)}
+        Choice.objects.bulk_create(
+            Choice(question_id=copy_of[question_id], choice_text=text)
+            for question_id, text in Choice.objects.filter(
+                question__in=list(copy_of)
+            )
+            .order_by("pk")
+            .values_list("question_id", "choice_text")
+        )
+        _changed()
+    return copies
+
+
+def advance(now=None):
+    """
+    Opens and closes questions whose publish or end date has passed,
+    takes snapshots of the results of those closed and invalidates the
+    index and their results. Returns their ids.
+    """
+    with transaction.atomic():
+        ids = Question.objects.advance(now)
+        if ids:
+            refresh_snapshots(ids)
+            _changed()
+    return ids
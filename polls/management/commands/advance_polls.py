@@ -0,0 +1,63 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from polls import lifecycle
+from polls.models import Question
+from polls.purge import purge, purge_in_background, unfinished
+
+
+class Command(BaseCommand):
+    """
+    Open and close polls whose publish or end date has passed. Run it
+    from cron, or keep it running with --loop, which sleeps until the
+    next poll is due (at most --max-sleep seconds, so polls scheduled in
+    the meantime are picked up). Purges of polls that were cut short are
+    finished when it starts, in the background with --loop.
+    """
+
+    help = "Move polls to their next status when they open or close"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, advancing polls as they become due",
+        )
+        parser.add_argument(
+            "--max-sleep",
+            type=float,
+            default=30.0,
+            help="Longest wait between checks with --loop, in seconds",
+        )
+
+    def handle(self, *args, **options):
+        purging = unfinished()
+        if options["loop"]:
+            if purging:
+                purge_in_background(purging)
+            while True:
+                self.advance()
+                self.sleep(options["max_sleep"])
+        self.advance()
+        # After advancing, polls due don't wait for ballots to be deleted
+        for pk in purging:
+            purge(pk)
+        if purging:
+            self.stdout.write(f"Finished purging {len(purging)} poll(s).")
+
+    def advance(self):
+        ids = lifecycle.advance()
+        if ids:
+            self.stdout.write(f"Advanced {len(ids)} poll(s).")
+
+    def sleep(self, max_sleep):
+        """Sleeps until the next poll is due, at most max_sleep seconds"""
+        now = timezone.now()
+        due = Question.objects.next_transition(now)
+        close_old_connections()
+        wait = max_sleep
+        if due is not None:
+            wait = min(wait, max((due - now).total_seconds(), 0))
+        # Statuses change once the dates have passed
+        time.sleep(wait + 0.001)
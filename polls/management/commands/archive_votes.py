@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls import archive
+from polls.export import FORMATS
+
+
+class Command(BaseCommand):
+    """
+    Move ballots of polls closed more than --days ago to gzipped files in
+    POLLS_ARCHIVE_DIR, keeping only the vote counts of their choices in
+    the database. Ballots are deleted in batches of --batch-size, each in
+    a short transaction, so voting elsewhere is not held up.
+
+    Archived ballots are brought back with the restore_votes command.
+    """
+
+    help = "Archive ballots of old polls to files and delete them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=180,
+            help="Archive polls closed more than this many days ago",
+        )
+        parser.add_argument(
+            "--id",
+            type=int,
+            action="append",
+            dest="ids",
+            help="Only archive this question, can be repeated",
+        )
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ballots deleted per transaction",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Ballots read from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        questions = archive.archivable(options["days"])
+        if options["ids"]:
+            questions = questions.filter(pk__in=options["ids"])
+        polls = ballots = 0
+        for question in questions.order_by("pk").iterator():
+            try:
+                count = archive.archive(
+                    question,
+                    options["format"],
+                    options["batch_size"],
+                    options["chunk_size"],
+                )
+            except (archive.ArchiveError, OSError) as e:
+                raise CommandError(e)
+            self.stdout.write(
+                f"Question {question.pk}: {count} ballot(s) archived to "
+                f"{question.ballots_archive}"
+            )
+            polls += 1
+            ballots += count
+        self.stdout.write(f"Archived {ballots} ballot(s) of {polls} poll(s).")
@@ -0,0 +1,91 @@
+import json
+import random
+from itertools import count
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+from polls.bench import run_threaded
+from polls.management.commands.polls_bench import BENCH_PREFIX
+from polls.models import Question, VoteData
+
+
+class Command(BaseCommand):
+    """
+    Cast concurrent first votes on a single question, once for each
+    number of counter shards given, and compare throughput and latency.
+    Benchmark questions and voters are removed afterwards. SQLite
+    serializes all writers on a database lock, run this against a server
+    database to see the effect of sharding on row lock contention.
+    """
+
+    help = "Benchmark concurrent votes on one question by counter shards"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votes", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--choices", type=int, default=2)
+        parser.add_argument(
+            "--shards",
+            default="1,8",
+            help="Comma separated counter shard counts to compare",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            shard_counts = [int(n) for n in options["shards"].split(",")]
+        except ValueError:
+            raise CommandError("--shards must be comma separated numbers")
+        if any(n < 1 for n in shard_counts):
+            raise CommandError("Shard counts must be at least 1")
+        User.objects.bulk_create(
+            (
+                User(username=f"{BENCH_PREFIX}-voter-{i}", password="!")
+                for i in range(options["votes"])
+            ),
+            ignore_conflicts=True,
+        )
+        bench_users = User.objects.filter(
+            username__startswith=f"{BENCH_PREFIX}-voter-"
+        )
+        users = list(bench_users.order_by("pk")[: options["votes"]])
+        try:
+            report = self.run(shard_counts, users, options)
+        finally:
+            bench_users.delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, shard_counts, users, options):
+        """Returns stats of votes cast for each number of shards"""
+        report = {}
+        for shards in shard_counts:
+            question = Question.objects.create(
+                question_text=f"{BENCH_PREFIX} counters {shards}",
+                publish_date=timezone.now(),
+                counter_shards=shards,
+            )
+            choices = [
+                question.choice_set.create(choice_text=f"Choice {i}")
+                for i in range(options["choices"])
+            ]
+            voters = count()
+
+            def vote():
+                user = users[next(voters)]
+                VoteData.objects.cast_vote(user, random.choice(choices))
+
+            try:
+                stats = run_threaded(
+                    vote, options["votes"], options["concurrency"]
+                )
+                counted = question.choice_set.with_votes().aggregate(
+                    total=Sum("votes")
+                )["total"]
+                stats["counted"] = counted
+                stats["recorded"] = VoteData.objects.filter(
+                    question=question
+                ).count()
+            finally:
+                question.delete()
+            report[f"{shards} shard(s)"] = stats
+        return report
@@ -0,0 +1,154 @@
+import asyncio
+import importlib
+import json
+import threading
+from itertools import count
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import AsyncClient, Client, override_settings
+from django.urls import clear_url_caches, reverse
+from polls.archive import recount
+from polls.bench import client_settings, run_async, run_threaded
+from polls.management.commands.polls_bench import BENCH_PREFIX
+from polls.models import Question
+from polls.snapshots import refresh_snapshots
+
+VIEWS = ("details", "results", "vote")
+
+
+def reload_urls():
+    importlib.reload(importlib.import_module("polls.urls"))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class Command(BaseCommand):
+    """
+    Compare the WSGI handler with sync views against the ASGI handler
+    with async views, under the same concurrent load. Both handlers run
+    in this process through the test clients, so the numbers leave out
+    the web server itself. Benchmark users and their votes are removed
+    afterwards, and the counters of the question recounted.
+    """
+
+    help = "Benchmark WSGI and ASGI deployments of the polls views"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument(
+            "--question",
+            type=int,
+            help="Question to use, defaults to the newest open one",
+        )
+        parser.add_argument(
+            "--views",
+            default=",".join(VIEWS),
+            help=f"Comma separated views to run, from {', '.join(VIEWS)}",
+        )
+
+    def handle(self, *args, **options):
+        if options["question"]:
+            question = Question.objects.filter(pk=options["question"]).first()
+        else:
+            question = (
+                Question.objects.open_for_voting()
+                .order_by("-publish_date")
+                .first()
+            )
+        if question is None:
+            raise CommandError("No open question to benchmark")
+        choices = list(question.choice_set.values_list("pk", flat=True))
+        if not choices:
+            raise CommandError(f"Question {question.pk} has no choices")
+        views = [v for v in options["views"].split(",") if v]
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise CommandError(f"Unknown views: {', '.join(sorted(unknown))}")
+        users = [
+            User.objects.get_or_create(
+                username=f"{BENCH_PREFIX}-handlers-{i}",
+                defaults={"password": "!"},
+            )[0]
+            for i in range(options["concurrency"])
+        ]
+
+        report = {}
+        try:
+            with client_settings(), override_settings(POLLS_ASYNC_VIEWS=False):
+                reload_urls()
+                report["wsgi"] = self.run_wsgi(
+                    question, choices, users, views, options
+                )
+            with client_settings(), override_settings(POLLS_ASYNC_VIEWS=True):
+                reload_urls()
+                report["asgi"] = asyncio.run(
+                    self.run_asgi(question, choices, users, views, options)
+                )
+        finally:
+            reload_urls()
+            self.clean_up(question, users)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def clean_up(self, question, users):
+        """Removes benchmark users, their votes going with them"""
+        with transaction.atomic():
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+            if not question.ballots_archive:
+                recount(question.pk)
+            refresh_snapshots([question.pk])
+
+    def requests(self, question, choices, view):
+        """Returns (method, url, data factory) of a request to view"""
+        if view == "vote":
+            url = reverse("polls:vote", args=(question.pk,))
+            picks = count()
+            return "post", url, lambda: {
+                "choice": choices[next(picks) % len(choices)]
+            }
+        url = reverse(f"polls:{view}", args=(question.pk,))
+        return "get", url, lambda: None
+
+    def run_wsgi(self, question, choices, users, views, options):
+        local = threading.local()
+        user_ids = count()
+
+        def client():
+            if not hasattr(local, "client"):
+                local.client = Client()
+                user = users[next(user_ids) % len(users)]
+                local.client.force_login(user)
+            return local.client
+
+        results = {}
+        for view in views:
+            method, url, data = self.requests(question, choices, view)
+            results[view] = run_threaded(
+                lambda: getattr(client(), method)(url, data()),
+                options["requests"],
+                options["concurrency"],
+            )
+        return results
+
+    async def run_asgi(self, question, choices, users, views, options):
+        clients = []
+        for user in users:
+            client = AsyncClient()
+            await asyncio.to_thread(client.force_login, user)
+            clients.append(client)
+        picks = count()
+
+        results = {}
+        for view in views:
+            method, url, data = self.requests(question, choices, view)
+
+            async def request():
+                client = clients[next(picks) % len(clients)]
+                await getattr(client, method)(url, data())
+
+            results[view] = await run_async(
+                request, options["requests"], options["concurrency"]
+            )
+        return results
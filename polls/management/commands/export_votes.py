@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls.export import (
+    FORMATS,
+    STATES,
+    InvalidFilter,
+    export_rows,
+    iter_lines,
+    parse_when,
+)
+
+
+class Command(BaseCommand):
+    """
+    Export raw votes, joined with their user, choice and question, or
+    per-choice results. Rows are streamed from the database in chunks,
+    so memory stays bounded whatever the number of votes.
+    """
+
+    help = "Export votes or results as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--results",
+            action="store_const",
+            const="results",
+            default="votes",
+            dest="kind",
+            help="Export vote counts of each choice instead of votes",
+        )
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--question", type=int)
+        parser.add_argument(
+            "--since", help="Questions published from this date"
+        )
+        parser.add_argument(
+            "--until", help="Questions published up to this date"
+        )
+        parser.add_argument("--state", choices=STATES)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows read from the database at a time",
+        )
+        parser.add_argument("--output", help="File to write, stdout if unset")
+
+    def handle(self, *args, **options):
+        try:
+            header, rows = export_rows(
+                options["kind"],
+                chunk_size=options["chunk_size"],
+                question=options["question"],
+                since=parse_when(options["since"]),
+                until=parse_when(options["until"], end=True),
+                state=options["state"],
+            )
+        except InvalidFilter as e:
+            raise CommandError(e)
+        lines = iter_lines(header, rows, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,239 @@
+import sys
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from polls.cache import bump_index_version
+from polls.importing import FORMATS, RowError, read_rows
+from polls.models import Choice, Question, Status
+from polls.snapshots import refresh_snapshots
+
+TRUE = {"1", "true", "yes", "y", "on"}
+FALSE = {"0", "false", "no", "n", "off"}
+
+
+def parse_date(value, field):
+    if value in (None, ""):
+        return None
+    when = parse_datetime(str(value))
+    if when is None:
+        raise RowError(f"{field} is not a date and time: {value!r}")
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def parse_visibility(value):
+    if value in (None, ""):
+        return True
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in TRUE:
+        return True
+    if str(value).lower() in FALSE:
+        return False
+    raise RowError(f"visibility is not a boolean: {value!r}")
+
+
+def clean_row(row):
+    """Returns (Question, choice texts) of a row, or raises RowError"""
+    if isinstance(row, RowError):
+        raise row
+    text = (row.get("question_text") or "").strip()
+    if not text:
+        raise RowError("question_text is required")
+    max_length = Question._meta.get_field("question_text").max_length
+    if len(text) > max_length:
+        raise RowError(f"question_text is over {max_length} characters")
+
+    publish_date = parse_date(row.get("publish_date"), "publish_date")
+    if publish_date is None:
+        raise RowError("publish_date is required")
+    end_date = parse_date(row.get("end_date"), "end_date")
+    if end_date is not None and end_date < publish_date:
+        raise RowError("end_date is before publish_date")
+
+    choices = row.get("choices") or []
+    if isinstance(choices, str):
+        choices = choices.split("|")
+    if not isinstance(choices, list):
+        raise RowError("choices must be a list")
+    choices = [str(c).strip() for c in choices if str(c).strip()]
+    if not choices:
+        raise RowError("at least one choice is required")
+    max_length = Choice._meta.get_field("choice_text").max_length
+    if any(len(c) > max_length for c in choices):
+        raise RowError(f"a choice is over {max_length} characters")
+    if len(set(choices)) != len(choices):
+        raise RowError("choices are not unique")
+
+    external_id = str(row.get("external_id") or "").strip() or None
+    question = Question(
+        question_text=text,
+        publish_date=publish_date,
+        end_date=end_date,
+        visibilty=parse_visibility(row.get("visibility")),
+        external_id=external_id,
+    )
+    question.status = question.compute_status()
+    return question, choices
+
+
+class Command(BaseCommand):
+    """
+    Import polls and their choices from a CSV or JSONL file, in batches
+    of bulk inserts. The file is streamed, so memory stays the same
+    whatever its size. Invalid rows are reported and skipped.
+
+    Columns (CSV) or keys (JSONL): external_id, question_text,
+    publish_date, end_date, visibility and choices. Dates are ISO 8601,
+    in the current time zone when they have no offset.
+
+    With --update, rows are matched to questions imported before by
+    external_id. Matched questions are updated and get the choices they
+    are missing, so the same file can be imported again safely. Choices
+    missing from the file are kept, they may have votes.
+    """
+
+    help = "Import polls with their choices from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows inserted per transaction",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Update questions with the same external_id instead of "
+            "reporting them as duplicates",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        if fmt is None:
+            fmt = options["path"].rsplit(".", 1)[-1].lower()
+            if fmt not in FORMATS:
+                raise CommandError("Unknown file format, use --format")
+        self.update = options["update"]
+        self.created = self.updated = self.errors = 0
+        if options["path"] == "-":
+            self.import_file(sys.stdin, fmt, options["batch_size"])
+        else:
+            try:
+                f = open(options["path"], newline="", encoding="utf-8")
+            except OSError as e:
+                raise CommandError(e)
+            with f:
+                self.import_file(f, fmt, options["batch_size"])
+        if self.created or self.updated:
+            bump_index_version()
+        self.stdout.write(
+            f"Imported {self.created} poll(s), updated {self.updated}, "
+            f"{self.errors} error(s)."
+        )
+
+    def error(self, line_num, message):
+        self.errors += 1
+        self.stderr.write(f"Line {line_num}: {message}")
+
+    def import_file(self, f, fmt, batch_size):
+        rows = read_rows(f, fmt)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line_num, row in chunk:
+                try:
+                    batch.append((line_num, *clean_row(row)))
+                except RowError as e:
+                    self.error(line_num, e)
+            if batch:
+                self.import_batch(batch)
+
+    def import_batch(self, batch):
+        """Inserts or updates a batch of (line, question, choices) rows"""
+        # Duplicate external ids within the batch keep their first row
+        seen = set()
+        unique = []
+        for line_num, question, choices in batch:
+            if question.external_id is not None:
+                if question.external_id in seen:
+                    self.error(line_num, "external_id repeats in the file")
+                    continue
+                seen.add(question.external_id)
+            unique.append((line_num, question, choices))
+        try:
+            with transaction.atomic():
+                created, updated = self.write_batch(unique)
+        except DatabaseError as e:
+            for line_num, _, _ in unique:
+                self.error(line_num, f"not imported, {e}")
+            return
+        self.created += created
+        self.updated += updated
+
+    def write_batch(self, batch):
+        """Writes a batch of rows, returns (created, updated) counts"""
+        external_ids = [q.external_id for _, q, _ in batch if q.external_id]
+        existing = {
+            q.external_id: q
+            for q in Question.objects.select_for_update().filter(
+                external_id__in=external_ids
+            )
+        }
+        new, updates = [], []
+        for line_num, question, choices in batch:
+            current = existing.get(question.external_id)
+            if current is None:
+                new.append((question, choices))
+            elif self.update:
+                question.pk = current.pk
+                updates.append((question, choices))
+            else:
+                self.error(
+                    line_num,
+                    f"external_id {question.external_id!r} was imported "
+                    "before, use --update to update it",
+                )
+
+        Question.objects.bulk_create([q for q, _ in new])
+        Question.objects.bulk_update(
+            [q for q, _ in updates],
+            [
+                "question_text",
+                "publish_date",
+                "end_date",
+                "visibilty",
+                "status",
+            ],
+        )
+        # Updated questions only get the choices they are missing
+        have = set(
+            Choice.objects.filter(
+                question__in=[q for q, _ in updates]
+            ).values_list("question", "choice_text")
+        )
+        Choice.objects.bulk_create(
+            Choice(question=question, choice_text=text)
+            for question, choices in new + updates
+            for text in choices
+            if (question.pk, text) not in have
+        )
+        # Updates may reopen or close questions, and closed questions
+        # imported get their result snapshot
+        refresh_snapshots(
+            [q.pk for q, _ in updates]
+            + [q.pk for q, _ in new if q.status == Status.CLOSED]
+        )
+        return len(new), len(updates)
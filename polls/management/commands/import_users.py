@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from polls.hashers import ProvisionalPasswordHasher
+from polls.importing import FORMATS, RowError, read_rows
+
+FIELDS = ("username", "password", "email", "first_name", "last_name")
+
+
+def _setup_worker():
+    # Workers started with spawn (macOS, Windows) import Django afresh
+    django.setup()
+
+
+def hash_password(password):
+    return make_password(password)
+
+
+def hash_provisionally(password):
+    return make_password(password, hasher=ProvisionalPasswordHasher.algorithm)
+
+
+def clean_row(row, User):
+    """Returns (User, raw password) of a roster row, or raises RowError"""
+    if isinstance(row, RowError):
+        raise row
+    values = {f: str(row.get(f) or "").strip() for f in FIELDS}
+    user = User(**{f: values[f] for f in FIELDS if f != "password"})
+    try:
+        user.clean_fields(exclude=["password", "last_login", "date_joined"])
+    except ValidationError as e:
+        messages = "; ".join(
+            f"{field}: {' '.join(errors)}"
+            for field, errors in e.message_dict.items()
+        )
+        raise RowError(messages)
+    return user, values["password"] or None
+
+
+class Command(BaseCommand):
+    """
+    Create user accounts from a CSV or JSONL roster, in batches of bulk
+    inserts. The file is streamed, and passwords of each batch are hashed
+    in parallel by a pool of processes, one per core by default.
+
+    Columns (CSV) or keys (JSONL): username, password, email, first_name
+    and last_name. Users without a password can't log in until one is
+    set. Usernames already taken are skipped, found with one query
+    before importing.
+
+    With --defer-hashing, passwords are hashed with a provisional
+    single-iteration hasher, so importing takes no time, and hashed again
+    properly when each user first logs in.
+    """
+
+    help = "Create user accounts from a CSV or JSONL roster"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Roster to import, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Users inserted per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes hashing passwords, defaults to one per core",
+        )
+        parser.add_argument(
+            "--defer-hashing",
+            action="store_true",
+            help="Hash passwords properly on first login instead",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        if fmt is None:
+            fmt = options["path"].rsplit(".", 1)[-1].lower()
+            if fmt not in FORMATS:
+                raise CommandError("Unknown file format, use --format")
+        self.User = get_user_model()
+        self.created = self.skipped = self.errors = 0
+        self.taken = set(
+            self.User._default_manager.values_list("username", flat=True)
+        )
+        self.workers = options["workers"]
+        self.pool = None
+        if options["defer_hashing"]:
+            self.hash = lambda passwords: map(hash_provisionally, passwords)
+        elif self.workers > 1:
+            self.pool = ProcessPoolExecutor(
+                self.workers, initializer=_setup_worker
+            )
+            self.hash = self.hash_in_pool
+        else:
+            self.hash = lambda passwords: map(hash_password, passwords)
+
+        started = time.perf_counter()
+        try:
+            if options["path"] == "-":
+                self.import_file(sys.stdin, fmt, options["batch_size"])
+            else:
+                try:
+                    f = open(options["path"], newline="", encoding="utf-8")
+                except OSError as e:
+                    raise CommandError(e)
+                with f:
+                    self.import_file(f, fmt, options["batch_size"])
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Imported {self.created} user(s), skipped {self.skipped} "
+            f"existing, {self.errors} error(s) in {elapsed:.1f}s "
+            f"({self.created / elapsed if elapsed else 0:.0f} users/s)."
+        )
+
+    def error(self, line_num, message):
+        self.errors += 1
+        self.stderr.write(f"Line {line_num}: {message}")
+
+    def hash_in_pool(self, passwords):
+        # A few chunks per worker keeps them all busy until the end
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return self.pool.map(hash_password, passwords, chunksize=chunksize)
+
+    def import_file(self, f, fmt, batch_size):
+        rows = read_rows(f, fmt)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line_num, row in chunk:
+                try:
+                    user, password = clean_row(row, self.User)
+                except RowError as e:
+                    self.error(line_num, e)
+                    continue
+                if user.username in self.taken:
+                    self.skipped += 1
+                    continue
+                self.taken.add(user.username)
+                batch.append((line_num, user, password))
+            if batch:
+                self.import_batch(batch)
+
+    def import_batch(self, batch):
+        """Hashes passwords of a batch of rows and inserts their users"""
+        passwords = [password for _, _, password in batch if password]
+        hashes = iter(self.hash(passwords))
+        for _, user, password in batch:
+            if password:
+                user.password = next(hashes)
+            else:
+                user.set_unusable_password()
+        try:
+            with transaction.atomic():
+                self.User._default_manager.bulk_create(
+                    [user for _, user, _ in batch]
+                )
+        except DatabaseError as e:
+            for line_num, _, _ in batch:
+                self.error(line_num, f"not imported, {e}")
+            return
+        self.created += len(batch)
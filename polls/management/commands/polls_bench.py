@@ -0,0 +1,217 @@
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+from itertools import count
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from polls.bench import client_settings, count_queries, run_threaded
+from polls.models import Choice, Question, Status, VoteData
+
+BENCH_PREFIX = "polls-bench"
+VIEWS = ("index", "details", "results", "vote", "mixed")
+
+
+class Command(BaseCommand):
+    """
+    Seed a synthetic dataset with bulk inserts, then drive the polls
+    views through the test client at a chosen concurrency. Reports
+    throughput, latency percentiles and SQL queries per view as JSON,
+    so runs can be compared between commits. The mixed view reads
+    results and votes concurrently, to compare database settings.
+    """
+
+    help = "Seed a synthetic dataset and benchmark the polls views"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            action="store_true",
+            help="Insert a synthetic dataset before benchmarking",
+        )
+        parser.add_argument("--questions", type=int, default=1000)
+        parser.add_argument("--choices", type=int, default=10)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--votes", type=int, default=10000)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per bulk insert when seeding",
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--views",
+            default=",".join(VIEWS),
+            help=f"Comma separated views to run, from {', '.join(VIEWS)}",
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Share of votes among results reads in the mixed view",
+        )
+        parser.add_argument("--output", help="Write the report to a file")
+
+    def handle(self, *args, **options):
+        views = [v for v in options["views"].split(",") if v]
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise CommandError(f"Unknown views: {', '.join(sorted(unknown))}")
+        if options["seed"]:
+            if options["votes"] > options["users"] * options["questions"]:
+                raise CommandError("More votes than (user, question) pairs")
+            started = time.perf_counter()
+            self.seed(options)
+            self.stderr.write(
+                f"Seeded in {time.perf_counter() - started:.1f}s"
+            )
+
+        question_ids = list(
+            Question.objects.open_for_voting()
+            .filter(question_text__startswith=BENCH_PREFIX)
+            .values_list("pk", flat=True)[:1000]
+        )
+        if not question_ids:
+            raise CommandError("No benchmark questions, run with --seed")
+        choices = {}
+        for pk, question_id in Choice.objects.filter(
+            question__in=question_ids
+        ).values_list("pk", "question"):
+            choices.setdefault(question_id, []).append(pk)
+        users = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)[
+                : options["concurrency"]
+            ]
+        )
+
+        with client_settings():
+            report = {
+                "dataset": {
+                    "questions": Question.objects.count(),
+                    "choices": Choice.objects.count(),
+                    "users": User.objects.count(),
+                    "votes": VoteData.objects.count(),
+                },
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "views": {
+                    view: self.bench_view(
+                        view, question_ids, choices, users, options
+                    )
+                    for view in views
+                },
+            }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def seed(self, options):
+        """Bulk inserts questions, choices, users and votes"""
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        with transaction.atomic():
+            questions = Question.objects.bulk_create(
+                (
+                    Question(
+                        question_text=f"{BENCH_PREFIX} question {i}",
+                        publish_date=now - timedelta(minutes=i + 1),
+                        # Every tenth poll has already ended
+                        end_date=now - timedelta(minutes=1)
+                        if i % 10 == 9
+                        else None,
+                        status=Status.CLOSED if i % 10 == 9 else Status.OPEN,
+                    )
+                    for i in range(options["questions"])
+                ),
+                batch_size=batch_size,
+            )
+            choices = Choice.objects.bulk_create(
+                (
+                    Choice(question=question, choice_text=f"Choice {j}")
+                    for question in questions
+                    for j in range(options["choices"])
+                ),
+                batch_size=batch_size,
+            )
+            User.objects.bulk_create(
+                (
+                    User(username=f"{BENCH_PREFIX}-{i}", password="!")
+                    for i in range(options["users"])
+                ),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        user_ids = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)
+            .order_by("pk")
+            .values_list("pk", flat=True)[: options["users"]]
+        )
+        per_question = options["choices"]
+
+        def votes():
+            # Vote i goes to a distinct (user, question) pair
+            for i in range(options["votes"]):
+                q = i // len(user_ids)
+                choice = choices[q * per_question + i % per_question]
+                yield VoteData(
+                    user_id=user_ids[i % len(user_ids)],
+                    question_id=questions[q].pk,
+                    choice_id=choice.pk,
+                )
+
+        generated = votes()
+        while True:
+            batch = [v for _, v in zip(range(batch_size), generated)]
+            if not batch:
+                break
+            with transaction.atomic():
+                VoteData.objects.bulk_create(batch, ignore_conflicts=True)
+        call_command("rebuild_vote_counts", stdout=self.stderr)
+
+    def bench_view(self, view, question_ids, choices, users, options):
+        local = threading.local()
+        user_ids = count()
+
+        def client():
+            if not hasattr(local, "client"):
+                local.client = Client()
+                if users:
+                    user = users[next(user_ids) % len(users)]
+                    local.client.force_login(user)
+            return local.client
+
+        def request():
+            question_id = random.choice(question_ids)
+            if view == "index":
+                return client().get(reverse("polls:index"))
+            if view == "mixed":
+                # Results reads and votes, as when a poll is being shared
+                if random.random() >= options["write_ratio"]:
+                    url = reverse("polls:results", args=(question_id,))
+                    return client().get(url)
+            if view in ("vote", "mixed"):
+                return client().post(
+                    reverse("polls:vote", args=(question_id,)),
+                    {"choice": random.choice(choices[question_id])},
+                )
+            return client().get(reverse(f"polls:{view}", args=(question_id,)))
+
+        # Log in and warm up the caches, queries are those of a request
+        # in the steady state
+        request()
+        queries = count_queries(request)
+        stats = run_threaded(
+            request, options["requests"], options["concurrency"]
+        )
+        stats["queries"] = queries
+        return stats
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls import lifecycle
+from polls.export import STATES, InvalidFilter, filter_questions, parse_when
+
+ACTIONS = {
+    "publish": "Published",
+    "close": "Closed",
+    "hide": "Hid",
+    "clone": "Cloned",
+}
+
+
+class Command(BaseCommand):
+    """
+    Publish, close, hide or clone a selection of polls with single bulk
+    statements in one transaction, e.g. closing every poll of a semester:
+
+        manage.py polls_lifecycle close --published-before 2022-12-31
+    """
+
+    help = "Publish, close, hide or clone many polls at once"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=list(ACTIONS))
+        parser.add_argument(
+            "--id",
+            type=int,
+            action="append",
+            dest="ids",
+            help="Select a question by id, can be repeated",
+        )
+        parser.add_argument(
+            "--published-after", help="Select questions published from"
+        )
+        parser.add_argument(
+            "--published-before", help="Select questions published until"
+        )
+        parser.add_argument("--state", choices=STATES)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Select every question when no other option is given",
+        )
+        parser.add_argument(
+            "--when",
+            help="Date to publish or close at, or to publish clones from, "
+            "defaults to now",
+        )
+
+    def handle(self, *args, **options):
+        selected = (
+            options["ids"]
+            or options["published_after"]
+            or options["published_before"]
+            or options["state"]
+        )
+        if not selected and not options["all"]:
+            raise CommandError("Select questions, or pass --all")
+        try:
+            questions = filter_questions(
+                since=parse_when(options["published_after"]),
+                until=parse_when(options["published_before"], end=True),
+                state=options["state"],
+            )
+            when = parse_when(options["when"])
+        except InvalidFilter as e:
+            raise CommandError(e)
+        if options["ids"]:
+            questions = questions.filter(pk__in=options["ids"])
+
+        action = options["action"]
+        if action == "publish":
+            count = lifecycle.publish(questions, when)
+        elif action == "close":
+            count = lifecycle.close(questions, when)
+        elif action == "hide":
+            count = lifecycle.hide(questions)
+        else:
+            count = len(lifecycle.clone(questions, when))
+        self.stdout.write(f"{ACTIONS[action]} {count} poll(s).")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls.models import Question
+from polls.purge import purge, unfinished
+
+
+class Command(BaseCommand):
+    """
+    Delete polls with their choices and ballots in batches, see
+    polls.purge. Each poll is hidden first, and progress is printed
+    after every batch. With --resume, purges that were cut short are
+    finished too.
+    """
+
+    help = "Delete large polls in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("question_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Also finish purges that were interrupted",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ballots deleted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        ids = options["question_ids"]
+        if not ids and not options["resume"]:
+            raise CommandError("Give questions to purge, or pass --resume")
+        missing = set(ids) - set(
+            Question.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        if missing:
+            missing = ", ".join(map(str, sorted(missing)))
+            raise CommandError(f"Questions do not exist: {missing}")
+        if options["resume"]:
+            ids = [*ids, *(pk for pk in unfinished() if pk not in ids)]
+        for pk in ids:
+
+            def progress(deleted, total, pk=pk):
+                self.stdout.write(
+                    f"Question {pk}: {deleted} of {total} ballot(s) deleted"
+                )
+
+            purge(pk, options["batch_size"], progress)
+            self.stdout.write(f"Question {pk} deleted.")
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from polls.models import Choice, ChoiceCounterShard, VoteData
+from polls.snapshots import refresh_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Recount Choice.vote_count from VoteData, in chunks of choices,
+    to repair counters that have drifted. Counter shards of repaired
+    choices are removed and result snapshots of their questions taken
+    again. Polls whose ballots are archived keep their counters.
+    """
+
+    help = "Rebuild the denormalized vote counters of choices"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of choices recounted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        last_id = 0
+        fixed = 0
+        while True:
+            ids = list(
+                Choice.objects.filter(
+                    pk__gt=last_id, question__ballots_archive=""
+                )
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                counts = dict(
+                    VoteData.objects.filter(choice__in=ids)
+                    .values_list("choice")
+                    .annotate(n=Count("id"))
+                )
+                choices = list(
+                    Choice.objects.select_for_update()
+                    .filter(pk__in=ids)
+                    .with_votes()
+                    .only("pk", "question_id", "vote_count")
+                )
+                drifted = []
+                for choice in choices:
+                    count = counts.get(choice.pk, 0)
+                    if choice.votes != count:
+                        choice.vote_count = count
+                        drifted.append(choice)
+                Choice.objects.bulk_update(drifted, ["vote_count"])
+                ChoiceCounterShard.objects.filter(choice__in=drifted).delete()
+                refresh_snapshots({c.question_id for c in drifted})
+            fixed += len(drifted)
+        self.stdout.write(f"Rebuilt vote counters, {fixed} choice(s) fixed.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls import archive
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """
+    Bring back ballots of polls archived with archive_votes, e.g. for an
+    audit. Vote counters are recounted from the restored ballots, so
+    ballots that could not be restored are no longer counted.
+    """
+
+    help = "Restore archived ballots of polls"
+
+    def add_arguments(self, parser):
+        parser.add_argument("question_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ballots inserted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        for pk in options["question_ids"]:
+            try:
+                question = Question.objects.get(pk=pk)
+                count = archive.restore(question, options["batch_size"])
+            except Question.DoesNotExist:
+                raise CommandError(f"Question {pk} does not exist")
+            except (archive.ArchiveError, OSError, ValueError) as e:
+                raise CommandError(e)
+            self.stdout.write(f"Question {pk}: {count} ballot(s) restored.")
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0003_remove_choice_vote_count_alter_question_end_date_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["visibilty", "publish_date", "end_date"],
+                name="question_state_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+def count_votes(apps, schema_editor):
+    Choice = apps.get_model("polls", "Choice")
+    VoteData = apps.get_model("polls", "VoteData")
+    counts = VoteData.objects.values("choice").annotate(n=models.Count("id"))
+    for row in counts.iterator():
+        Choice.objects.filter(pk=row["choice"]).update(vote_count=row["n"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0004_question_state_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="choice",
+            name="vote_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
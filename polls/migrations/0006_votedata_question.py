@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-18 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_questions(apps, schema_editor):
+    """
+    Copy the question of each vote from its choice, then keep only the
+    latest vote of a user on a question so the constraint can be applied.
+    """
+    Choice = apps.get_model("polls", "Choice")
+    VoteData = apps.get_model("polls", "VoteData")
+    VoteData.objects.update(
+        question_id=models.Subquery(
+            Choice.objects.filter(pk=models.OuterRef("choice_id")).values(
+                "question_id"
+            )[:1]
+        )
+    )
+    duplicates = (
+        VoteData.objects.values("user", "question")
+        .annotate(latest=models.Max("id"), n=models.Count("id"))
+        .filter(n__gt=1)
+    )
+    removed = 0
+    for row in list(duplicates):
+        deleted, _ = (
+            VoteData.objects.filter(user=row["user"], question=row["question"])
+            .exclude(pk=row["latest"])
+            .delete()
+        )
+        removed += deleted
+    if removed:
+        # Recount vote counters since duplicated votes were removed
+        Choice.objects.update(vote_count=0)
+        counts = VoteData.objects.values("choice").annotate(n=models.Count("id"))
+        for row in counts.iterator():
+            Choice.objects.filter(pk=row["choice"]).update(vote_count=row["n"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("polls", "0005_choice_vote_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="votedata",
+            name="question",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="polls.question",
+            ),
+        ),
+        migrations.RunPython(backfill_questions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="votedata",
+            name="question",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="polls.question"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="votedata",
+            constraint=models.UniqueConstraint(
+                fields=("user", "question"), name="one_vote_per_question"
+            ),
+        ),
+    ]
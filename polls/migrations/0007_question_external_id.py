@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0006_votedata_question"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="external_id",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=100,
+                null=True,
+                unique=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0007_question_external_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="counter_shards",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text="Rows each choice's votes are counted on. Raise it for polls with many voters at the same time, it can be changed while voting is open.",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChoiceCounterShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "choice",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="polls.choice"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="choicecountershard",
+            constraint=models.UniqueConstraint(
+                fields=("choice", "shard"), name="one_row_per_shard"
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2 on 2026-10-18 20:38
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compute_status(apps, schema_editor):
+    Question = apps.get_model("polls", "Question")
+    now = timezone.now()
+    Question.objects.update(
+        status=models.Case(
+            models.When(visibilty=False, then=models.Value("hidden")),
+            models.When(publish_date__gt=now, then=models.Value("scheduled")),
+            models.When(end_date__lt=now, then=models.Value("closed")),
+            default=models.Value("open"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0008_choicecountershard"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="question",
+            name="question_state_idx",
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("scheduled", "Scheduled"),
+                    ("open", "Open"),
+                    ("closed", "Closed"),
+                    ("hidden", "Hidden"),
+                ],
+                default="open",
+                editable=False,
+                max_length=9,
+            ),
+        ),
+        migrations.RunPython(compute_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["status", "publish_date"], name="question_status_publish_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["status", "end_date"], name="question_status_end_idx"
+            ),
+        ),
+    ]
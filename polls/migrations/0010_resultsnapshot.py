@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def snapshot_closed(apps, schema_editor):
+    Question = apps.get_model("polls", "Question")
+    Choice = apps.get_model("polls", "Choice")
+    ChoiceCounterShard = apps.get_model("polls", "ChoiceCounterShard")
+    ResultSnapshot = apps.get_model("polls", "ResultSnapshot")
+    shards = dict(
+        ChoiceCounterShard.objects.values_list("choice")
+        .annotate(n=models.Sum("count"))
+        .order_by()
+    )
+    for question_id in Question.objects.filter(status="closed").values_list(
+        "pk", flat=True
+    ):
+        rows = [
+            (pk, text, count + shards.get(pk, 0))
+            for pk, text, count in Choice.objects.filter(
+                question_id=question_id
+            )
+            .order_by("pk")
+            .values_list("pk", "choice_text", "vote_count")
+        ]
+        total = sum(votes for _, _, votes in rows)
+        ResultSnapshot.objects.create(
+            question_id=question_id,
+            data={
+                "total_votes": total,
+                "results": [
+                    {
+                        "id": pk,
+                        "choice_text": text,
+                        "votes": votes,
+                        "percentage": votes / total * 100 if total else 0,
+                    }
+                    for pk, text, votes in rows
+                ],
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0009_question_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultSnapshot",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="polls.question",
+                    ),
+                ),
+                ("data", models.JSONField()),
+                ("created", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(snapshot_closed, migrations.RunPython.noop),
+    ]
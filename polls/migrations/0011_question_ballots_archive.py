@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0010_resultsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="ballots_archive",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+    ]
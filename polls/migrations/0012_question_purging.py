@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0011_question_ballots_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="purging",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
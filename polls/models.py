@@ -1,9 +1,101 @@
+import random
 from datetime import timedelta
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, GreaterThan, LessThan
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class Status(models.TextChoices):
+    """Lifecycle status of a poll"""
+
+    SCHEDULED = "scheduled"
+    OPEN = "open"
+    CLOSED = "closed"
+    HIDDEN = "hidden"
+
+
+def status_expression(
+    now,
+    visibilty=models.F("visibilty"),
+    publish_date=models.F("publish_date"),
+    end_date=models.F("end_date"),
+):
+    """
+    Returns an expression of the status of questions at now, from their
+    fields or from the values given, e.g. those an UPDATE sets them to
+    """
+    return models.Case(
+        models.When(Exact(visibilty, False), then=models.Value(Status.HIDDEN)),
+        models.When(
+            GreaterThan(publish_date, models.Value(now)),
+            then=models.Value(Status.SCHEDULED),
+        ),
+        models.When(
+            LessThan(end_date, models.Value(now)),
+            then=models.Value(Status.CLOSED),
+        ),
+        default=models.Value(Status.OPEN),
+    )
+
+
+class QuestionQuerySet(models.QuerySet):
+    """
+    QuerySet for Question that filters polls by their status, kept in the
+    database by Question.save() and moved on in time by advance()
+    """
+
+    def published(self):
+        """Questions that are visible and already past their publish date"""
+        return self.filter(status__in=[Status.OPEN, Status.CLOSED])
+
+    def open_for_voting(self):
+        """Published questions that have not ended yet"""
+        return self.filter(status=Status.OPEN)
+
+    def closed(self):
+        """Published questions that have already ended"""
+        return self.filter(status=Status.CLOSED)
+
+    def due(self, now=None):
+        """Questions due to open or close at now"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status=Status.SCHEDULED, publish_date__lte=now)
+            | models.Q(status=Status.OPEN, end_date__lt=now)
+        )
+
+    def advance(self, now=None):
+        """
+        Moves questions due at now to their next status with one UPDATE,
+        returns their ids
+        """
+        now = now or timezone.now()
+        ids = list(self.due(now).values_list("pk", flat=True))
+        if ids:
+            Question.objects.filter(pk__in=ids).update(
+                status=status_expression(now)
+            )
+        return ids
+
+    def next_transition(self, now=None):
+        """Returns when the next question opens or closes, or None"""
+        now = now or timezone.now()
+        times = self.aggregate(
+            opens=models.Min(
+                "publish_date", filter=models.Q(status=Status.SCHEDULED)
+            ),
+            closes=models.Min(
+                "end_date",
+                filter=models.Q(status=Status.OPEN, end_date__gte=now),
+            ),
+        )
+        return min(filter(None, times.values()), default=None)
+
+
 class Question(models.Model):
     """
     Model for Question with publishing date
@@ -12,6 +104,14 @@ class Question(models.Model):
     :param publish_date: datetime when poll should be published
     :param end_date: datetime when poll should ended
     :param visibility: poll is hidden from users or not
+    :param external_id: id of the poll in the system it was imported from
+    :param counter_shards: number of rows each choice's votes are counted
+                           on, more lets more votes be counted at once
+    :param status: lifecycle status, computed from the fields above on
+                   save and moved on in time by QuerySet.advance()
+    :param ballots_archive: file the ballots were archived to and removed
+                            from the database, see polls.archive
+    :param purging: question is being deleted in batches, see polls.purge
     """
 
     question_text = models.CharField(max_length=280)
@@ -20,11 +120,72 @@ class Question(models.Model):
         "date closed", default=None, null=True, blank=True
     )
     visibilty = models.BooleanField("poll visibility", default=True)
+    external_id = models.CharField(
+        max_length=100, null=True, blank=True, unique=True, editable=False
+    )
+    counter_shards = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Rows each choice's votes are counted on. Raise it for "
+        "polls with many voters at the same time, it can be changed "
+        "while voting is open.",
+    )
+    status = models.CharField(
+        max_length=9,
+        choices=Status.choices,
+        default=Status.OPEN,
+        editable=False,
+    )
+    ballots_archive = models.CharField(
+        max_length=255, blank=True, default="", editable=False
+    )
+    purging = models.BooleanField(default=False, editable=False)
 
-    def is_published(self):
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "publish_date"],
+                name="question_status_publish_idx",
+            ),
+            models.Index(
+                fields=["status", "end_date"],
+                name="question_status_end_idx",
+            ),
+        ]
+
+    def compute_status(self, now=None):
+        """Returns status of the question at now, from its fields"""
+        now = now or timezone.now()
         if not self.visibilty:
-            return False
-        return timezone.now() >= self.publish_date
+            return Status.HIDDEN
+        if self.publish_date > now:
+            return Status.SCHEDULED
+        if self.end_date and self.end_date < now:
+            return Status.CLOSED
+        return Status.OPEN
+
+    def clean(self):
+        if self.ballots_archive and self.compute_status() in (
+            Status.OPEN,
+            Status.SCHEDULED,
+        ):
+            raise ValidationError(
+                "Ballots of this poll are archived, restore them with "
+                "restore_votes before reopening it."
+            )
+        if self.purging:
+            raise ValidationError("This poll is being deleted.")
+
+    def save(self, *args, **kwargs):
+        self.status = self.compute_status()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "status"}
+        super().save(*args, **kwargs)
+
+    def is_published(self):
+        return self.status in (Status.OPEN, Status.CLOSED)
 
     def was_published_recently(self):
         return (
@@ -34,16 +195,47 @@ class Question(models.Model):
         )
 
     def can_vote(self):
-        if not self.is_published():
-            return False
-        if not self.end_date:
-            return True
-        return self.end_date >= timezone.now() >= self.publish_date
+        # Dates are checked too, status may wait a while for advance_polls.
+        # Votes on archived ballots would be counted twice once restored,
+        # and votes on a poll being purged would be deleted with it.
+        return (
+            self.status == Status.OPEN
+            and self.compute_status() == Status.OPEN
+            and not self.ballots_archive
+            and not self.purging
+        )
 
     def __str__(self):
         return f"{self.question_text}"
 
 
+def shard_votes(**lookups):
+    """
+    Returns a subquery adding up the counts of the counter shards matching
+    lookups, e.g. choice=OuterRef("pk") for the shards of each choice
+    """
+    key = next(iter(lookups))
+    return Coalesce(
+        models.Subquery(
+            ChoiceCounterShard.objects.filter(**lookups)
+            .order_by()
+            .values(key)
+            .annotate(total=models.Sum("count"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class ChoiceQuerySet(models.QuerySet):
+    def with_votes(self):
+        """Annotates votes of each choice, adding up its counter shards"""
+        return self.annotate(
+            votes=models.F("vote_count")
+            + shard_votes(choice=models.OuterRef("pk"))
+        )
+
+
 class Choice(models.Model):
     """
     Model for Choice that makes relationship with Question
@@ -51,31 +243,157 @@ class Choice(models.Model):
 
     :param question: what Question does this relevant to
     :param choice_text: choice's short description
+    :param vote_count: denormalized count of VoteData for this choice,
+                       kept up to date by VoteData.objects.cast_vote(),
+                       without the votes counted on its ChoiceCounterShard
+                       rows; Choice.objects.with_votes() adds them up
     """
 
     # Designed with backtracking relationship
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=80)
+    vote_count = models.IntegerField(default=0, editable=False)
 
-    @property
-    def vote_count(self):
-        return VoteData.objects.filter(choice=self).count()
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
-        return f"{self.choice_text}; with {self.vote_count} vote(s)"
+        # Votes are left out, counting them all needs the counter shards
+        return self.choice_text
+
+
+class ChoiceCounterShard(models.Model):
+    """
+    Part of the vote counter of a choice, for questions with several
+    counter_shards. Votes of a choice are its vote_count plus the counts
+    of its shards, which may be negative when votes are taken back.
+
+    :param choice: the choice counted
+    :param shard: index of the shard, below the question's counter_shards
+    :param count: votes counted on this shard
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice", "shard"], name="one_row_per_shard"
+            ),
+        ]
+
+
+class ResultSnapshot(models.Model):
+    """
+    Final results of a closed question, see polls.snapshots. Results of
+    closed questions no longer change, so they are served from here
+    instead of being counted again.
+
+    :param question: the closed question
+    :param data: total votes and per-choice results, see compute_results()
+    :param created: when the snapshot was taken
+    """
+
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True
+    )
+    data = models.JSONField()
+    created = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Results of {self.question_id} at {self.created}"
+
+
+def count_vote(choice_id, shards, delta):
+    """
+    Adds delta to the votes of a choice, on a random one of shards
+    counter shards when there are several, so concurrent voters rarely
+    wait on the same row.
+    """
+    if shards <= 1:
+        Choice.objects.filter(pk=choice_id).update(
+            vote_count=models.F("vote_count") + delta
+        )
+        return
+    shard = random.randrange(shards)
+    counter = ChoiceCounterShard.objects.filter(
+        choice_id=choice_id, shard=shard
+    )
+    if counter.update(count=models.F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            ChoiceCounterShard.objects.create(
+                choice_id=choice_id, shard=shard, count=delta
+            )
+            return
+    except IntegrityError:  # Created by a concurrent vote
+        counter.update(count=models.F("count") + delta)
+
+
+class VoteDataManager(models.Manager):
+    def cast_vote(self, user, choice):
+        """
+        Record a vote of user for choice, replacing their previous vote
+        on the same question. Vote counters of the affected choices are
+        updated with F() expressions in the same transaction.
+        """
+        with transaction.atomic():
+            # Counting the vote first takes the write lock before anything
+            # is read, so concurrent SQLite writers wait on busy_timeout
+            # instead of failing to upgrade a read lock.
+            shards = choice.question.counter_shards
+            count_vote(choice.id, shards, 1)
+            data, created = self.select_for_update().get_or_create(
+                user=user,
+                question_id=choice.question_id,
+                defaults={"choice": choice},
+            )
+            if not created:
+                # Take back the vote from the previous choice, which is the
+                # same one when voting again for it
+                count_vote(data.choice_id, shards, -1)
+                if data.choice_id != choice.id:
+                    data.choice = choice
+                    data.save(update_fields=["choice"])
+        return data
+
+    async def acast_vote(self, user, choice):
+        """
+        Async version of cast_vote(). Transactions are not supported by
+        the async ORM, so the vote is written in a worker thread.
+        """
+        return await sync_to_async(self.cast_vote)(user, choice)
 
 
 class VoteData(models.Model):
     """
     Model for a voting data where each vote contains associating user
-    and choice that they have voted
+    and choice that they have voted, a user has one vote per question
 
     :param user: who voted for the choice
+    :param question: question of the choice, filled from choice if unset
     :param choice: the choice that has been selected
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
 
+    objects = VoteDataManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "question"], name="one_vote_per_question"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.question_id is None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.username} voting for {self.choice.choice_text}"
@@ -0,0 +1,170 @@
+"""
+Pagination of large tables.
+
+Keyset (cursor) pages are found by filtering past the last row of the
+previous page instead of using OFFSET, so deep pages cost the same as
+the first one. EstimatedCountPaginator avoids a COUNT(*) over tables
+with millions of rows.
+"""
+import base64
+from datetime import datetime, timezone
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+MAX_PK = 2**63 - 1  # Largest primary key of 64-bit signed columns
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(question):
+    """Returns cursor pointing after question"""
+    raw = f"{question.publish_date.isoformat()}|{question.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (publish_date, pk) of a cursor from encode_cursor()"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        publish_date, pk = raw.split("|")
+        publish_date, pk = datetime.fromisoformat(publish_date), int(pk)
+        if publish_date.utcoffset() is None:
+            raise ValueError("Publish date has no time zone")
+        # Dates near datetime.min or max may not fit in UTC
+        publish_date.astimezone(timezone.utc)
+    except (ValueError, UnicodeError, OverflowError) as e:
+        raise InvalidCursor(cursor) from e
+    if not -MAX_PK - 1 <= pk <= MAX_PK:
+        raise InvalidCursor(cursor)
+    return publish_date, pk
+
+
+class KeysetPage:
+    """
+    A page of questions ordered by newest publish date, starting after
+    cursor. Rows are only fetched when the page is first read, so a page
+    rendered from cache costs no query.
+
+    :param queryset: questions to paginate
+    :param cursor: cursor of the last row of previous page, or None
+    :param per_page: number of questions in a page
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, cursor, per_page):
+        self.cursor = cursor
+        self.per_page = per_page
+        queryset = queryset.order_by("-publish_date", "-pk")
+        if cursor:
+            publish_date, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(publish_date__lt=publish_date)
+                | Q(publish_date=publish_date, pk__lt=pk)
+            )
+        self.queryset = queryset
+
+    @cached_property
+    def _rows(self):
+        # One extra row tells whether there is a next page
+        return list(self.queryset[:self.per_page + 1])
+
+    @property
+    def object_list(self):
+        return self._rows[:self.per_page]
+
+    @property
+    def has_next(self):
+        return len(self._rows) > self.per_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def estimate_count(queryset):
+    """
+    Returns the row count of an unfiltered queryset from the statistics
+    of PostgreSQL or SQLite, or None if it cannot be estimated
+    """
+    connection = connections[queryset.db]
+    if queryset.query.where:
+        return None
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for tables never analyzed
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == "sqlite":
+        return _estimate_sqlite_count(connection, queryset.model._meta)
+    return None
+
+
+def _estimate_sqlite_count(connection, opts):
+    """
+    Returns the row count of a table from sqlite_stat1, written by ANALYZE
+    or PRAGMA optimize, else its highest integer primary key: an upper
+    bound, found from the end of the table's b-tree
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'sqlite_stat1'"
+        )
+        if cursor.fetchone():
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1",
+                [opts.db_table],
+            )
+            row = cursor.fetchone()
+            if row:
+                # Rows in the table (or index), then rows per key prefix
+                return int(row[0].split()[0])
+        if opts.pk.get_internal_type() not in (
+            "AutoField",
+            "BigAutoField",
+            "SmallAutoField",
+        ):
+            return None
+        qn = connection.ops.quote_name
+        cursor.execute(
+            f"SELECT MAX({qn(opts.pk.column)}) FROM {qn(opts.db_table)}"
+        )
+        return cursor.fetchone()[0] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting unfiltered tables from database statistics once
+    they are over estimate_above rows. Filtered querysets and databases
+    other than PostgreSQL and SQLite are counted exactly.
+    """
+
+    estimate_above = 100000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > self.estimate_above:
+            return estimate
+        return super().count
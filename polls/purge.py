@@ -0,0 +1,115 @@
+"""
+Deletion of large polls.
+
+Deleting a question with Question.delete() makes Django load every choice
+and ballot it cascades to. purge() instead hides the question at once,
+then deletes its ballots in batches of single DELETE statements, each in
+its own short transaction, and finally the question with what is left of
+it. Memory stays the same whatever the number of ballots, and voters
+never wait long on the tables.
+
+Progress of a purge is logged and kept in the cache, see get_progress().
+Questions being purged are marked with Question.purging, so purges cut
+short, e.g. by a restart of the process running them in the background,
+are picked up again by purge_polls --resume and advance_polls.
+"""
+import logging
+import threading
+from django.core.cache import cache
+from django.db import connection, transaction
+from . import lifecycle
+from .archive import delete_ballots
+from .models import ChoiceCounterShard, Question, VoteData
+
+logger = logging.getLogger(__name__)
+
+
+def progress_key(question_id):
+    return f"polls:purge:{question_id}"
+
+
+def _mark(question_ids):
+    """Hides questions and marks them as being purged"""
+    with transaction.atomic():
+        lifecycle.hide(Question.objects.filter(pk__in=question_ids))
+        Question.objects.filter(pk__in=question_ids).update(purging=True)
+
+
+def unfinished():
+    """Returns ids of questions whose purge has not finished"""
+    return list(
+        Question.objects.filter(purging=True)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def get_progress(question_id):
+    """
+    Returns {"deleted": ballots deleted, "total": ballots to delete} of a
+    question being purged, or None
+    """
+    return cache.get(progress_key(question_id))
+
+
+def purge(question_id, batch_size=1000, progress=None):
+    """
+    Deletes a question with its choices and ballots in batches, see the
+    module docstring. Returns the number of ballots deleted.
+
+    :param progress: called with (ballots deleted, total) after each batch
+    """
+    _mark([question_id])
+    total = VoteData.objects.filter(question_id=question_id).count()
+    key = progress_key(question_id)
+
+    def report(deleted):
+        cache.set(key, {"deleted": deleted, "total": total}, None)
+        logger.info(
+            "Purging question %s: %d of %d ballot(s) deleted",
+            question_id,
+            deleted,
+            total,
+        )
+        if progress is not None:
+            progress(deleted, total)
+
+    report(0)
+    deleted = delete_ballots(question_id, batch_size, progress=report)
+    with transaction.atomic():
+        ChoiceCounterShard.objects.filter(
+            choice__question_id=question_id
+        ).delete()
+        # Only its few choices and snapshot are left to cascade to
+        Question.objects.filter(pk=question_id).delete()
+    cache.delete(key)
+    return deleted
+
+
+def _run(question_ids, batch_size):
+    try:
+        for pk in question_ids:
+            try:
+                purge(pk, batch_size)
+            except Exception:
+                logger.exception("Could not purge question %s", pk)
+    finally:
+        connection.close()
+
+
+def purge_in_background(question_ids, batch_size=1000):
+    """
+    Hides questions now and purges them one after the other in a
+    background thread, started once the current transaction commits.
+    Returns the thread.
+    """
+    question_ids = list(question_ids)
+    _mark(question_ids)
+    thread = threading.Thread(
+        target=_run,
+        args=(question_ids, batch_size),
+        name="polls-purge",
+        daemon=True,
+    )
+    transaction.on_commit(thread.start)
+    return thread
@@ -0,0 +1,196 @@
+"""
+Per-request SQL query recording and query budgets.
+
+Views declare how many queries a request to them may make, with a
+query_budget class attribute or the @query_budget decorator. Budgets
+should not depend on how many choices or votes a poll has.
+
+QueryBudgetMiddleware records every query of a request, its duration,
+the view and template that made it and how often the same SQL repeats.
+Each connection gets a single execute wrapper, which adds queries to the
+log of the request running them, found in a context variable. Async
+requests share threads and connections, their logs stay apart.
+Going over budget logs a warning when POLLS_QUERY_BUDGET is "warn" and
+raises QueryBudgetExceeded when it is "raise".
+"""
+import logging
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_current_log = ContextVar("polls_query_log", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """Declares how many queries a function view may make per request"""
+
+    def decorator(view_func):
+        view_func.query_budget = budget
+        return view_func
+
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Returns query budget declared by a view, or None"""
+    budget = getattr(view_func, "query_budget", None)
+    if budget is None:
+        view_class = getattr(view_func, "view_class", None)
+        budget = getattr(view_class, "query_budget", None)
+    return budget
+
+
+def _template_name():
+    """Returns name of the innermost template being rendered, if any"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == "render":
+            template = frame.f_locals.get("self")
+            if isinstance(template, Template):
+                return template.name
+        frame = frame.f_back
+    return None
+
+
+def _record_query(execute, sql, params, many, context):
+    log = _current_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    return log(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Adds the query recording wrapper to a connection, once. Connected to
+    connection_created, so every connection gets it when it opens.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class QueryLog:
+    """
+    Queries recorded for one request, see record().
+
+    :param view: name of the view the queries are made for
+    """
+
+    def __init__(self, view=None):
+        self.view = view
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "duration": time.perf_counter() - start,
+                    "alias": context["connection"].alias,
+                    "view": self.view,
+                    "template": _template_name(),
+                }
+            )
+
+    def __len__(self):
+        return len(self.queries)
+
+    @contextmanager
+    def record(self):
+        """
+        Context manager recording queries made in the current context,
+        including sync code it runs in other threads with sync_to_async
+        """
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+        token = _current_log.set(self)
+        try:
+            yield self
+        finally:
+            _current_log.reset(token)
+
+    def repeated(self):
+        """Returns {sql: count} of SQL statements made more than once"""
+        counts = Counter(q["sql"] for q in self.queries)
+        return {sql: n for sql, n in counts.items() if n > 1}
+
+    def report(self):
+        """Returns a readable summary of the recorded queries"""
+        lines = [
+            f"{len(self)} queries in "
+            f"{sum(q['duration'] for q in self.queries) * 1000:.1f}ms"
+        ]
+        for q in self.queries:
+            origin = q["template"] or q["view"]
+            lines.append(
+                f"  {q['duration'] * 1000:.1f}ms [{origin}] {q['sql']}"
+            )
+        for sql, n in self.repeated().items():
+            lines.append(f"  repeated {n} times: {sql}")
+        return "\n".join(lines)
+
+
+class QueryBudgetMiddleware:
+    """Checks that requests to views stay within their query budget"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if settings.POLLS_QUERY_BUDGET == "off":
+            return self.get_response(request)
+        log = request.query_log = QueryLog()
+        with log.record():
+            response = self.get_response(request)
+        return self.check(request, response)
+
+    async def __acall__(self, request):
+        if settings.POLLS_QUERY_BUDGET == "off":
+            return await self.get_response(request)
+        log = request.query_log = QueryLog()
+        with log.record():
+            response = await self.get_response(request)
+        return self.check(request, response)
+
+    def check(self, request, response):
+        """Attaches the query log to response, checking the view's budget"""
+        log = request.query_log
+        response.query_log = log
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and len(log) > budget:
+            message = (
+                f"{log.view} made {len(log)} queries, "
+                f"over its budget of {budget}\n{log.report()}"
+            )
+            if settings.POLLS_QUERY_BUDGET == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        log = getattr(request, "query_log", None)
+        if log is not None:
+            log.view = request.resolver_match.view_name
+            request.query_budget = get_query_budget(view_func)
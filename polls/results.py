@@ -0,0 +1,83 @@
+"""Aggregation of poll results"""
+from django.conf import settings
+from django.db import router
+from django.db.models import F, Sum, Window
+from .cache import get_or_recompute, get_results_version
+from .models import Choice, ResultSnapshot
+
+
+def compute_many(question_ids):
+    """
+    Returns {question id: results} of questions, see compute_results(),
+    using a single query whatever the number of questions.
+    """
+    # Read from the primary, results cached for a version must count
+    # every vote of that version, which replicas may still lack
+    rows = (
+        Choice.objects.using(router.db_for_write(Choice))
+        .filter(question_id__in=question_ids)
+        .with_votes()
+        .order_by("question_id", "pk")
+        .annotate(
+            total=Window(Sum("votes"), partition_by=[F("question_id")])
+        )
+        .values_list("question_id", "pk", "choice_text", "votes", "total")
+    )
+    results = {
+        pk: {"total_votes": 0, "results": []} for pk in question_ids
+    }
+    for question_id, pk, choice_text, votes, total in rows:
+        data = results[question_id]
+        data["total_votes"] = total or 0
+        data["results"].append(
+            {
+                "id": pk,
+                "choice_text": choice_text,
+                "votes": votes,
+                "percentage": votes / total * 100 if total else 0,
+            }
+        )
+    return results
+
+
+def compute_results(question_id):
+    """
+    Returns total votes and a row for each choice of a question with its
+    votes and percentage, using a single query.
+    """
+    return compute_many([question_id])[question_id]
+
+
+def load_results(question_id):
+    """
+    Returns results of a closed question from its snapshot, or counts
+    them when it has none yet.
+    """
+    data = (
+        ResultSnapshot.objects.using(router.db_for_write(ResultSnapshot))
+        .filter(question_id=question_id)
+        .values_list("data", flat=True)
+        .first()
+    )
+    return compute_results(question_id) if data is None else data
+
+
+def get_versioned_results(question_id, closed=False):
+    """
+    Returns results of a question from cache, see compute_results(),
+    and the results version they were computed for.
+
+    :param closed: the question is closed, its results are read from
+        its snapshot and cached until its results version changes
+    """
+    return get_or_recompute(
+        f"polls:results:{question_id}",
+        get_results_version(question_id),
+        lambda: (load_results if closed else compute_results)(question_id),
+        None if closed else settings.POLLS_RESULTS_CACHE_TIMEOUT,
+    )
+
+
+def get_results(question_id, closed=False):
+    """Returns results of a question from cache, see compute_results()"""
+    return get_versioned_results(question_id, closed)[0]
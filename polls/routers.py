@@ -0,0 +1,103 @@
+"""
+Read replica routing.
+
+Reads of polls models are spread over the aliases in POLLS_READ_REPLICAS
+and everything else goes to the primary ("default") database. Requests
+that write, admin pages and users who wrote in the last
+POLLS_PIN_PRIMARY_SECONDS read from the primary, so they never see data
+older than their own vote.
+"""
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "polls_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_pinned = ContextVar("polls_pinned_to_primary", default=False)
+
+
+class ReplicaRouter:
+    """Routes reads of the polls app to read replicas"""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.POLLS_READ_REPLICAS
+        if not replicas or model._meta.app_label != "polls":
+            return None
+        # Reads inside a transaction on the primary must see its writes,
+        # e.g. select_for_update() when casting a vote
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        dbs = {DEFAULT_DB_ALIAS, *settings.POLLS_READ_REPLICAS}
+        if obj1._state.db in dbs and obj2._state.db in dbs:
+            return True
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pins reads to the primary for unsafe requests, admin pages and for
+    POLLS_PIN_PRIMARY_SECONDS after a user's last successful write,
+    remembered with a cookie.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _pinned.set(self.pins(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.remember_write(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.pins(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.remember_write(request, response)
+
+    def pins(self, request):
+        """Returns whether request reads from the primary"""
+        writes = request.method not in SAFE_METHODS
+        return writes or PIN_COOKIE in request.COOKIES
+
+    def remember_write(self, request, response):
+        """Sets the pinning cookie on responses to successful writes"""
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and settings.POLLS_PIN_PRIMARY_SECONDS
+        ):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.POLLS_PIN_PRIMARY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.app_name == "admin":
+            _pinned.set(True)
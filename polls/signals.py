@@ -0,0 +1,51 @@
+"""Signal receivers keeping caches of the polls app up to date"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .auth import invalidate_user
+from .cache import bump_index_version
+from .events import notify_results_changed
+from .models import Choice, Question
+from .snapshots import refresh_snapshots
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_results(sender, instance, **kwargs):
+    """Choices added, renamed or removed change the poll results"""
+    notify_results_changed(instance.question_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_index(sender, instance, **kwargs):
+    """Questions added, edited, published or closed change the index"""
+    bump_index_version()
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+@receiver(post_save, sender=Question)
+def refresh_snapshot(sender, instance, **kwargs):
+    """
+    Reopened polls lose their result snapshot, closed polls edited in the
+    admin get a new one
+    """
+    question_id = instance.pk if sender is Question else instance.question_id
+    # After commit, when the question may have been deleted with its choices
+    transaction.on_commit(lambda: refresh_snapshots([question_id]))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Password changes, deactivation and other edits reach the cache"""
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
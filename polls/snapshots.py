@@ -0,0 +1,51 @@
+"""
+Frozen results of closed polls.
+
+Votes are only taken while a poll is open, so once it closes its results
+never change. A ResultSnapshot of them is taken when a poll closes and
+results pages and the results API serve closed polls from it, cached for
+as long as the poll's results version stays the same.
+
+Snapshots follow the status of their poll: reopening or hiding a poll
+removes its snapshot, and editing a closed poll or its choices takes a
+new one.
+"""
+from django.db import router, transaction
+from .events import notify_results_changed
+from .models import Question, ResultSnapshot, Status
+from .results import compute_many
+
+
+def refresh_snapshots(question_ids):
+    """
+    Takes snapshots of the closed questions among question_ids and
+    removes those of the others, then invalidates their results once the
+    transaction commits. Returns the ids of the snapshots taken.
+    """
+    question_ids = set(question_ids)
+    if not question_ids:
+        return []
+    db = router.db_for_write(ResultSnapshot)
+    with transaction.atomic(using=db):
+        closed = list(
+            Question.objects.using(db)
+            .filter(pk__in=question_ids, status=Status.CLOSED)
+            .values_list("pk", flat=True)
+        )
+        ResultSnapshot.objects.using(db).filter(
+            question__in=question_ids - set(closed)
+        ).delete()
+        results = compute_many(closed)
+        ResultSnapshot.objects.using(db).bulk_create(
+            [
+                ResultSnapshot(question_id=pk, data=data)
+                for pk, data in results.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["question"],
+            update_fields=["data", "created"],
+        )
+        transaction.on_commit(
+            lambda: notify_results_changed(*question_ids), using=db
+        )
+    return closed
@@ -0,0 +1,100 @@
+"""Tests for admin changelists"""
+from django.contrib.auth.models import User
+from django.db import connection
+from unittest import skipUnless
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import ChoiceCounterShard, VoteData
+from polls.pagination import EstimatedCountPaginator
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+    vote,
+)
+
+
+class TestAdmin(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "", "admin")
+        self.client.force_login(self.admin)
+        self.question = new_question_with_relative_date("Admin?")
+        self.next_user = 0
+
+    def add_votes(self, n):
+        """Adds n votes, each on a new choice of a new question"""
+        for _ in range(n):
+            question = new_question_with_relative_date("")
+            user = new_test_user(f"user{self.next_user}")
+            self.next_user += 1
+            vote(new_choice(question, "Yes"), user)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(200, resp.status_code)
+        return len(ctx.captured_queries)
+
+    def test_question_changelist_shows_totals(self):
+        """Question changelist shows choice and vote totals"""
+        yes = new_choice(self.question, "Yes")
+        new_choice(self.question, "No")
+        vote(yes, new_test_user("voter"))
+        ChoiceCounterShard.objects.create(choice=yes, shard=1, count=2)
+
+        resp = self.client.get(reverse("admin:polls_question_changelist"))
+
+        row = resp.context["cl"].result_list.get(pk=self.question.pk)
+        self.assertEqual((2, 3), (row.choice_count, row.total_votes))
+
+    @override_settings(POLLS_USER_CACHE_TIMEOUT=0)
+    def test_changelists_use_constant_queries(self):
+        """Changelists cost the same queries for 1 or 30 votes"""
+        urls = [
+            reverse("admin:polls_question_changelist"),
+            reverse("admin:polls_votedata_changelist"),
+        ]
+        self.add_votes(1)
+        small = [self.queries(url) for url in urls]
+        self.add_votes(29)
+        large = [self.queries(url) for url in urls]
+        self.assertEqual(small, large)
+
+    def test_votes_are_read_only(self):
+        """Votes can be viewed but not added in the admin"""
+        self.add_votes(1)
+        vote_id = VoteData.objects.get().pk
+        url = reverse("admin:polls_votedata_change", args=(vote_id,))
+        self.assertEqual(200, self.client.get(url).status_code)
+        url = reverse("admin:polls_votedata_add")
+        self.assertEqual(403, self.client.get(url).status_code)
+
+    def test_estimated_paginator_counts_small_tables_exactly(self):
+        """Tables under estimate_above rows are counted exactly"""
+        self.add_votes(3)
+        paginator = EstimatedCountPaginator(
+            VoteData.objects.order_by("pk"), 2
+        )
+        self.assertEqual(3, paginator.count)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite statistics")
+    def test_estimated_paginator_on_sqlite(self):
+        """SQLite tables are estimated without a COUNT(*)"""
+        self.add_votes(3)
+        VoteData.objects.filter(pk=VoteData.objects.earliest("pk").pk).delete()
+
+        def paginator():
+            paginator = EstimatedCountPaginator(
+                VoteData.objects.order_by("pk"), 2
+            )
+            paginator.estimate_above = 0
+            return paginator
+
+        # The highest id, until ANALYZE gathers statistics
+        self.assertEqual(VoteData.objects.latest("pk").pk, paginator().count)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(2, paginator().count)
+        self.assertNotIn("COUNT", ctx.captured_queries[-1]["sql"])
@@ -0,0 +1,166 @@
+"""Tests for archiving and restoring ballots of old polls"""
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import archive, lifecycle
+from polls.models import Choice, Question, Status, VoteData
+from polls.results import compute_results
+from polls.tests.utils import (
+    new_choice,
+    new_question_with_relative_date,
+    new_test_user,
+    vote,
+)
+
+
+class TestArchive(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(POLLS_ARCHIVE_DIR=tmp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.dir = tmp.name
+
+        self.old = new_question_with_relative_date("Old", -400, -200)
+        self.yes = new_choice(self.old, "Yes")
+        self.no = new_choice(self.old, "No")
+        for i in range(5):
+            vote(self.yes if i < 3 else self.no, new_test_user(f"user{i}"))
+        self.recent = new_question_with_relative_date("Recent", -10, -1)
+        vote(new_choice(self.recent, "Yes"), new_test_user("recent"))
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_votes", *args, stdout=out)
+        return out.getvalue()
+
+    def test_archives_old_polls(self):
+        """Ballots of old polls go to a file, their counts stay"""
+        results = compute_results(self.old.pk)
+        out = self.archive("--days", "30", "--batch-size", "2")
+
+        self.assertIn("Archived 5 ballot(s) of 1 poll(s).", out)
+        self.assertFalse(VoteData.objects.filter(question=self.old).exists())
+        self.assertTrue(VoteData.objects.filter(question=self.recent).exists())
+        self.assertEqual(results, compute_results(self.old.pk))
+        self.old.refresh_from_db()
+        path = os.path.join(self.dir, self.old.ballots_archive)
+        with gzip.open(path, "rt") as f:
+            ballots = [json.loads(line) for line in f]
+        self.assertEqual(5, len(ballots))
+        self.assertEqual({"Yes", "No"}, {b["choice_text"] for b in ballots})
+
+    def test_csv_format(self):
+        self.archive("--days", "30", "--format", "csv")
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.ballots_archive.endswith(".csv.gz"))
+        call_command("restore_votes", self.old.pk, stdout=StringIO())
+        self.assertEqual(5, VoteData.objects.filter(question=self.old).count())
+
+    def test_open_polls_are_not_archived(self):
+        question = new_question_with_relative_date("Open")
+        with self.assertRaises(archive.ArchiveError):
+            archive.archive(question)
+
+    def test_archive_twice(self):
+        """Archived polls are not archived again"""
+        self.archive("--days", "30")
+        self.assertIn("Archived 0 ballot(s) of 0 poll(s).", self.archive())
+
+    def test_restore(self):
+        """Restored ballots are the archived ones, counters are kept"""
+        before = set(
+            VoteData.objects.filter(question=self.old).values_list(
+                "pk", "user", "choice"
+            )
+        )
+        self.archive("--days", "30")
+        out = StringIO()
+        call_command("restore_votes", self.old.pk, stdout=out)
+
+        self.assertIn("5 ballot(s) restored", out.getvalue())
+        self.assertEqual(
+            before,
+            set(
+                VoteData.objects.filter(question=self.old).values_list(
+                    "pk", "user", "choice"
+                )
+            ),
+        )
+        self.assertEqual(3, Choice.objects.get(pk=self.yes.pk).vote_count)
+        self.old.refresh_from_db()
+        self.assertEqual("", self.old.ballots_archive)
+
+    def test_restore_skips_ballots_cast_again(self):
+        """Users with a ballot again keep it, counters follow the ballots"""
+        self.archive("--days", "30")
+        VoteData.objects.create(
+            user=User.objects.get(username="user0"),
+            question=self.old,
+            choice=self.no,
+        )
+        self.old.refresh_from_db()
+
+        self.assertEqual(4, archive.restore(self.old))
+        self.assertEqual(5, VoteData.objects.filter(question=self.old).count())
+        self.assertEqual(
+            [2, 3],
+            [
+                Choice.objects.get(pk=c.pk).vote_count
+                for c in (self.yes, self.no)
+            ],
+        )
+
+    def test_archived_polls_stay_closed(self):
+        """Polls can't be reopened, or take votes, until restored"""
+        self.archive("--days", "30")
+        self.assertEqual(
+            0, lifecycle.publish(Question.objects.filter(pk=self.old.pk))
+        )
+        self.old.refresh_from_db()
+        self.assertEqual(Status.CLOSED, self.old.status)
+
+        self.old.end_date = None
+        with self.assertRaises(ValidationError):
+            self.old.full_clean()
+        Question.objects.filter(pk=self.old.pk).update(
+            end_date=None, status=Status.OPEN
+        )
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.can_vote())
+
+    def test_restore_not_archived(self):
+        with self.assertRaises(CommandError):
+            call_command("restore_votes", self.old.pk, stdout=StringIO())
+
+    def test_rebuild_skips_archived(self):
+        """Counters of archived polls are not recounted to zero"""
+        self.archive("--days", "30")
+        call_command("rebuild_vote_counts", stdout=StringIO())
+        self.assertEqual(3, Choice.objects.get(pk=self.yes.pk).vote_count)
+
+    def test_closed_polls_take_no_votes(self):
+        """Votes on closed polls are turned away"""
+        user = new_test_user("late")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse("polls:vote", args=(self.old.pk,)),
+            {"choice": self.yes.pk},
+        )
+        self.assertRedirects(
+            response,
+            reverse("polls:results", args=(self.old.pk,)),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(VoteData.objects.filter(user=user).exists())
@@ -0,0 +1,121 @@
+"""Tests for async variants of the views"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import include, path, reverse
+from polls import views
+from polls.models import VoteData
+from polls.tests.utils import (
+    assert_within_query_budget,
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+urlpatterns = [
+    path(
+        "polls/",
+        include(
+            (
+                [
+                    path("", views.IndexView.as_view(), name="index"),
+                    path(
+                        "<int:pk>/",
+                        views.AsyncDetailsView.as_view(),
+                        name="details",
+                    ),
+                    path(
+                        "<int:pk>/results/",
+                        views.AsyncResultsView.as_view(),
+                        name="results",
+                    ),
+                    path("<int:question_id>/vote/", views.avote, name="vote"),
+                ],
+                "polls",
+            )
+        ),
+    ),
+    path("accounts/", include("django.contrib.auth.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, POLLS_QUERY_BUDGET="raise")
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.user = new_test_user("test")
+        self.question = new_question_with_relative_date("Test Question")
+        self.choice = new_choice(self.question, "A")
+
+    async def login(self):
+        await sync_to_async(self.client.force_login)(self.user)
+
+    async def test_vote_redirects_when_not_logged_in(self):
+        """Anonymous voters are sent to the login page"""
+        url = reverse("polls:vote", args=(self.question.id,))
+        resp = await self.client.post(url, {"choice": self.choice.id})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp["Location"], f"/accounts/login/?next={url}")
+
+    async def test_vote_is_recorded(self):
+        """Votes are cast and counted, then user is sent to results"""
+        await self.login()
+        url = reverse("polls:vote", args=(self.question.id,))
+        resp = await self.client.post(url, {"choice": self.choice.id})
+
+        self.assertEqual(resp.status_code, 302)
+        data = await VoteData.objects.select_related("choice").aget(
+            user=self.user
+        )
+        self.assertEqual(data.choice.vote_count, 1)
+
+    async def test_vote_without_choice(self):
+        """Missing choice shows an error message"""
+        await self.login()
+        url = reverse("polls:vote", args=(self.question.id,))
+        resp = await self.client.post(url, {"choice": 9999})
+        self.assertContains(resp, "You didn&#x27;t choose a choice!")
+
+    async def test_vote_for_missing_question(self):
+        """Voting on a non-existant question returns 404"""
+        await self.login()
+        url = reverse("polls:vote", args=(9999,))
+        resp = await self.client.post(url, {"choice": 1})
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_details_shows_selected_choice(self):
+        """Details page shows choices with the user's vote selected"""
+        await VoteData.objects.acast_vote(self.user, self.choice)
+        await self.login()
+        url = reverse("polls:details", args=(self.question.id,))
+        resp = await self.client.get(url)
+
+        self.assertContains(resp, "Test Question")
+        self.assertEqual(resp.context["selected_choice"], self.choice.id)
+
+    async def test_queries_are_budgeted(self):
+        """Queries of async views are recorded and held to the budget"""
+        await self.login()
+        url = reverse("polls:details", args=(self.question.id,))
+        resp = await self.client.get(url)
+
+        self.assertGreater(len(resp.query_log), 0)
+        self.assertEqual("polls:details", resp.query_log.view)
+        assert_within_query_budget(self, resp)
+
+    async def test_details_of_unpublished_question(self):
+        """Unpublished questions return 404"""
+        question = await sync_to_async(new_question_with_relative_date)(
+            "", 1
+        )
+        url = reverse("polls:details", args=(question.id,))
+        resp = await self.client.get(url)
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_results(self):
+        """Results page shows vote counts"""
+        await VoteData.objects.acast_vote(self.user, self.choice)
+        url = reverse("polls:results", args=(self.question.id,))
+        resp = await self.client.get(url)
+        self.assertContains(resp, '<span class="votes">1</span>')
@@ -0,0 +1,92 @@
+"""Tests for cached sessions and users"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.auth import CachedModelBackend, user_key
+from polls.tests.utils import (
+    new_choice,
+    new_question_with_relative_date,
+    new_test_user,
+)
+
+UNCACHED = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+    "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+}
+
+
+@override_settings(POLLS_USER_CACHE_TIMEOUT=300)
+class TestCachedUsers(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = new_test_user("voter")
+        self.user.set_password("secret")
+        self.user.save()
+        self.question = new_question_with_relative_date("Cached?")
+        self.choice = new_choice(self.question, "Yes")
+
+    def queries(self):
+        """Returns query counts of a request to every polls view"""
+        args = (self.question.pk,)
+        requests = [
+            lambda: self.client.get(reverse("polls:index")),
+            lambda: self.client.get(reverse("polls:details", args=args)),
+            lambda: self.client.get(reverse("polls:results", args=args)),
+            lambda: self.client.post(
+                reverse("polls:vote", args=args), {"choice": self.choice.pk}
+            ),
+        ]
+        counts = []
+        for request in requests:
+            request()  # Warms up the caches
+            with CaptureQueriesContext(connection) as ctx:
+                request()
+            counts.append(len(ctx.captured_queries))
+        return counts
+
+    def test_two_queries_fewer_per_request(self):
+        """Sessions and users come from the cache"""
+        with self.settings(**UNCACHED):
+            self.client.force_login(self.user)
+            uncached = self.queries()
+        # Middleware, with its session engine, is loaded once per client
+        self.client = self.client_class()
+        self.client.force_login(self.user)
+        cached = self.queries()
+        for before, after in zip(uncached, cached):
+            self.assertLessEqual(after, before - 2)
+
+    def test_cached_user_is_slim(self):
+        """Fields left out of the cache are loaded when accessed"""
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            user = backend.get_user(self.user.pk)
+            self.assertEqual("voter", user.username)
+        self.assertEqual(0, len(ctx.captured_queries))
+        self.assertEqual("", user.email)
+
+    def test_password_change_logs_out(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("polls:index"))
+        self.user.set_password("changed")
+        self.user.save()
+        response = self.client.get(reverse("polls:index"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_deactivation_logs_out(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("polls:index"))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("polls:index"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_logout_forgets_user(self):
+        self.client.login(username="voter", password="secret")
+        self.client.get(reverse("polls:index"))
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.client.post(reverse("logout"))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
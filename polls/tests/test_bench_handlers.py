@@ -0,0 +1,49 @@
+"""Tests for bench_handlers command"""
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+from polls.models import Choice, VoteData
+from polls.tests.utils import new_question_with_relative_date, new_choice
+
+
+class TestBenchHandlers(TransactionTestCase):
+    def test_reports_both_handlers(self):
+        """Throughput and latency are reported per handler and view"""
+        question = new_question_with_relative_date("")
+        new_choice(question, "A")
+        new_choice(question, "B")
+        out = StringIO()
+        call_command("bench_handlers", requests=4, concurrency=2, stdout=out)
+
+        report = json.loads(out.getvalue())
+        for handler in ("wsgi", "asgi"):
+            for view in ("details", "results", "vote"):
+                stats = report[handler][view]
+                # Concurrent votes may fail on a locked SQLite database
+                self.assertEqual(stats["requests"] + stats["errors"], 4)
+                self.assertIn("throughput", stats)
+                self.assertIn("p99_ms", stats)
+
+    def test_cleans_up(self):
+        """Benchmark users and votes don't stay in the database"""
+        question = new_question_with_relative_date("")
+        new_choice(question, "A")
+        call_command(
+            "bench_handlers",
+            requests=4,
+            concurrency=2,
+            views="vote",
+            stdout=StringIO(),
+        )
+
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(VoteData.objects.exists())
+        self.assertEqual(0, Choice.objects.with_votes().get().votes)
+
+    def test_requires_open_question(self):
+        """The command fails without a question to vote on"""
+        with self.assertRaises(CommandError):
+            call_command("bench_handlers", stdout=StringIO())
@@ -50,7 +50,7 @@ class TestChoiceModel(TestCase):
         check_votes(1, 0, 0)
 
         choice = question.choice_set.get(pk=2)
-        vote(choice, self.user)
+        vote(choice, new_test_user("another"))
 
         check_votes(1, 1, 0)
 
@@ -59,4 +59,4 @@ class TestChoiceModel(TestCase):
         text = "Test Choice"
         question = new_question("", timezone.now())
         choice = new_choice(question, text)
-        self.assertEqual(f"{text}; with 0 vote(s)", str(choice))
+        self.assertEqual(text, str(choice))
@@ -0,0 +1,97 @@
+"""Tests for sharded vote counters"""
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from polls.models import ChoiceCounterShard, Question, VoteData
+from polls.results import compute_results
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+
+class TestCounterShards(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = new_question_with_relative_date("Hot poll")
+        self.question.counter_shards = 4
+        self.question.save()
+        self.yes = new_choice(self.question, "Yes")
+        self.no = new_choice(self.question, "No")
+        self.users = [new_test_user(f"user{i}") for i in range(20)]
+
+    def test_votes_are_spread_over_shards(self):
+        """Votes land on shards and are added up on read"""
+        for user in self.users:
+            VoteData.objects.cast_vote(user, self.yes)
+
+        self.yes.refresh_from_db()
+        self.assertEqual(0, self.yes.vote_count)
+        shards = ChoiceCounterShard.objects.filter(choice=self.yes)
+        self.assertGreater(shards.count(), 1)
+        self.assertTrue(all(s.shard < 4 for s in shards))
+        results = compute_results(self.question.id)
+        self.assertEqual(20, results["total_votes"])
+        self.assertEqual(20, results["results"][0]["votes"])
+
+    def test_changed_votes_move_between_choices(self):
+        for user in self.users:
+            VoteData.objects.cast_vote(user, self.yes)
+        for user in self.users[:5]:
+            VoteData.objects.cast_vote(user, self.no)
+            VoteData.objects.cast_vote(user, self.no)
+
+        votes = dict(
+            self.question.choice_set.with_votes().values_list(
+                "choice_text", "votes"
+            )
+        )
+        self.assertEqual({"Yes": 15, "No": 5}, votes)
+
+    def test_shard_count_changes_online(self):
+        """Votes counted with another number of shards are kept"""
+        for user in self.users[:10]:
+            VoteData.objects.cast_vote(user, self.yes)
+        Question.objects.filter(pk=self.question.pk).update(counter_shards=1)
+        self.question.refresh_from_db()
+        self.yes.question = self.question
+        for user in self.users[10:]:
+            VoteData.objects.cast_vote(user, self.yes)
+
+        self.assertEqual(20, compute_results(self.question.id)["total_votes"])
+
+    def test_rebuild_folds_shards(self):
+        """Rebuilding counters moves repaired counts out of shards"""
+        for user in self.users:
+            VoteData.objects.cast_vote(user, self.yes)
+        ChoiceCounterShard.objects.filter(choice=self.yes).update(count=0)
+
+        call_command("rebuild_vote_counts", stdout=StringIO())
+
+        self.yes.refresh_from_db()
+        self.assertEqual(20, self.yes.vote_count)
+        self.assertFalse(ChoiceCounterShard.objects.exists())
+
+
+class TestBenchCounters(TransactionTestCase):
+    def test_report(self):
+        """Every shard count is benchmarked and its votes counted"""
+        out = StringIO()
+        call_command(
+            "bench_counters",
+            votes=8,
+            concurrency=2,
+            shards="1,4",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        for key in ("1 shard(s)", "4 shard(s)"):
+            stats = report[key]
+            self.assertEqual(8, stats["requests"] + stats["errors"])
+            self.assertEqual(stats["recorded"], stats["counted"])
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,22 @@
+"""Tests for tuning of database connections"""
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase, override_settings
+from polls.db import configure_sqlite
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite only")
+class TestConfigureSqlite(TestCase):
+    @override_settings(
+        SQLITE_PRAGMAS={"busy_timeout": 1234, "cache_size": -4096}
+    )
+    def test_pragmas_are_applied(self):
+        """SQLITE_PRAGMAS are run, without counting as queries"""
+        # On the raw connection, so they stay out of query budgets
+        with self.assertNumQueries(0):
+            configure_sqlite(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(1234, cursor.fetchone()[0])
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(-4096, cursor.fetchone()[0])
@@ -1,5 +1,7 @@
 """Tests for Details view"""
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from polls.tests.utils import (
     new_question_with_relative_date,
@@ -82,3 +84,35 @@ class TestDetailsView(TestCase):
         # After voting, should have a choice selected.
         resp = self.client.get(url)
         self.assertContains(resp, generate_radio_btn(choice.id, "1", True))
+
+    def test_missing_question_should_return_404(self):
+        """Questions that do not exist return 404"""
+        url = reverse("polls:details", args=(404,))
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, 404)
+
+    @override_settings(POLLS_USER_CACHE_TIMEOUT=0)
+    def test_question_is_fetched_once(self):
+        """Details page fetches its question once, whatever its choices"""
+        question = new_question_with_relative_date("")
+        url = reverse("polls:details", args=(question.id,))
+        self.client.force_login(self.user)
+        vote(new_choice(question, "0"), self.user)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for i in range(1, 20):
+            new_choice(question, f"{i}")
+        with CaptureQueriesContext(connection) as large:
+            resp = self.client.get(url)
+
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries)
+        )
+        fetches = [
+            q["sql"]
+            for q in large.captured_queries
+            if 'FROM "polls_question"' in q["sql"]
+        ]
+        self.assertEqual(len(fetches), 1)
+        self.assertTrue(resp.context["can_vote"])
@@ -0,0 +1,87 @@
+"""Tests for exports of votes and results"""
+import csv
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+    vote,
+)
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.open = new_question_with_relative_date("Open?")
+        self.closed = new_question_with_relative_date("Closed?", -5, -1)
+        self.users = [new_test_user(f"user{i}") for i in range(3)]
+        yes = new_choice(self.open, "Yes")
+        new_choice(self.open, "No")
+        for user in self.users:
+            vote(yes, user)
+        vote(new_choice(self.closed, "Maybe"), self.users[0])
+        self.staff = new_test_user("staff")
+        self.staff.is_staff = True
+        self.staff.save()
+
+    def export(self, kind="votes", fmt="csv", **params):
+        url = reverse("polls:export", args=(kind, fmt))
+        return self.client.get(url, params)
+
+    def test_staff_only(self):
+        """Users that are not staff are sent to the admin login"""
+        self.client.force_login(self.users[0])
+        self.assertEqual(302, self.export().status_code)
+
+    def test_export_votes_csv(self):
+        """Votes are streamed as CSV, joined with user, choice, question"""
+        self.client.force_login(self.staff)
+        resp = self.export()
+
+        self.assertTrue(resp.streaming)
+        self.assertEqual("text/csv", resp["Content-Type"])
+        content = b"".join(resp.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(4, len(rows))
+        self.assertEqual(
+            {"username": "user0", "choice_text": "Yes",
+             "question_text": "Open?"},
+            {k: rows[0][k] for k in ("username", "choice_text",
+                                     "question_text")},
+        )
+
+    def test_filters(self):
+        """Exports filter by question, poll state and publish date"""
+        self.client.force_login(self.staff)
+
+        def usernames(**params):
+            resp = self.export(fmt="jsonl", **params)
+            lines = b"".join(resp.streaming_content).decode().splitlines()
+            return [json.loads(line)["username"] for line in lines]
+
+        self.assertEqual(["user0"], usernames(state="closed"))
+        self.assertEqual(3, len(usernames(question=self.open.id)))
+        self.assertEqual(
+            ["user0"], usernames(until=self.closed.publish_date.isoformat())
+        )
+        self.assertEqual(400, self.export(state="lost").status_code)
+        self.assertEqual(400, self.export(since="yesterday").status_code)
+
+    def test_export_command(self):
+        """The command writes results and votes to stdout"""
+        out = StringIO()
+        call_command("export_votes", "--results", stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(
+            [("Yes", "3"), ("No", "0"), ("Maybe", "1")],
+            [(r["choice_text"], r["votes"]) for r in rows],
+        )
+
+        out = StringIO()
+        call_command(
+            "export_votes", format="jsonl", state="open", stdout=out
+        )
+        self.assertEqual(3, len(out.getvalue().splitlines()))
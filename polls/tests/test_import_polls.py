@@ -0,0 +1,119 @@
+"""Tests for import_polls command"""
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from polls.models import Question
+from polls.tests.utils import new_test_user, vote
+
+
+class TestImportPolls(TestCase):
+    def write(self, suffix, content):
+        """Writes content to a temporary file, returns its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command("import_polls", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        """CSV rows become questions with their choices"""
+        path = self.write(
+            ".csv",
+            "external_id,question_text,publish_date,end_date,visibility,"
+            "choices\n"
+            "a,First?,2022-09-01T10:00:00,2022-09-10T10:00:00,true,Yes|No\n"
+            "b,Second?,2022-09-02T10:00:00,,no,One|Two|Three\n",
+        )
+        out, err = self.run_import(path, batch_size=1)
+
+        self.assertIn("Imported 2 poll(s), updated 0, 0 error(s).", out)
+        first = Question.objects.get(external_id="a")
+        self.assertEqual(
+            ["Yes", "No"],
+            [c.choice_text for c in first.choice_set.order_by("pk")],
+        )
+        self.assertIsNotNone(first.end_date)
+        second = Question.objects.get(external_id="b")
+        self.assertFalse(second.visibilty)
+        self.assertIsNone(second.end_date)
+        self.assertEqual(3, second.choice_set.count())
+
+    def test_invalid_rows_are_reported(self):
+        """Invalid rows are reported by line and the others imported"""
+        rows = [
+            {"question_text": "Ok?", "publish_date": "2022-09-01T10:00",
+             "choices": ["Yes", "No"]},
+            {"question_text": "", "publish_date": "2022-09-01T10:00",
+             "choices": ["Yes"]},
+            {"question_text": "Date?", "publish_date": "tomorrow",
+             "choices": ["Yes"]},
+            {"question_text": "Ends?", "publish_date": "2022-09-02T10:00",
+             "end_date": "2022-09-01T10:00", "choices": ["Yes"]},
+            {"question_text": "No choices?",
+             "publish_date": "2022-09-01T10:00", "choices": []},
+        ]
+        path = self.write(
+            ".jsonl",
+            "\n".join(json.dumps(r) for r in rows) + "\nnot json\n",
+        )
+        out, err = self.run_import(path, batch_size=2)
+
+        self.assertIn("Imported 1 poll(s), updated 0, 5 error(s).", out)
+        for line in range(2, 7):
+            self.assertIn(f"Line {line}:", err)
+        self.assertIn("end_date is before publish_date", err)
+        self.assertEqual(["Ok?"], [str(q) for q in Question.objects.all()])
+
+    def test_reimport_without_update_reports_duplicates(self):
+        """Rows with external ids imported before are not duplicated"""
+        path = self.write(
+            ".jsonl",
+            json.dumps(
+                {"external_id": "a", "question_text": "Q?",
+                 "publish_date": "2022-09-01T10:00", "choices": ["Yes"]}
+            ),
+        )
+        self.run_import(path)
+        out, err = self.run_import(path)
+
+        self.assertIn("0 poll(s), updated 0, 1 error(s).", out)
+        self.assertIn("use --update", err)
+        self.assertEqual(1, Question.objects.count())
+
+    def test_reimport_with_update(self):
+        """--update updates questions and adds their missing choices"""
+        row = {"external_id": "a", "question_text": "Q?",
+               "publish_date": "2022-09-01T10:00", "choices": ["Yes"]}
+        self.run_import(self.write(".jsonl", json.dumps(row)))
+        question = Question.objects.get(external_id="a")
+        vote(question.choice_set.get(), new_test_user("voter"))
+
+        row.update(question_text="Changed?", choices=["Yes", "No"])
+        out, _ = self.run_import(
+            self.write(".jsonl", json.dumps(row)), update=True
+        )
+
+        self.assertIn("Imported 0 poll(s), updated 1, 0 error(s).", out)
+        question.refresh_from_db()
+        self.assertEqual("Changed?", question.question_text)
+        self.assertEqual(
+            [("Yes", 1), ("No", 0)],
+            list(
+                question.choice_set.order_by("pk").values_list(
+                    "choice_text", "vote_count"
+                )
+            ),
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(CommandError):
+            self.run_import(self.write(".txt", ""))
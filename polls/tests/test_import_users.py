@@ -0,0 +1,75 @@
+"""Tests for import_users command"""
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from polls.tests.utils import new_test_user
+
+
+class TestImportUsers(TestCase):
+    def write(self, suffix, content):
+        """Writes content to a temporary file, returns its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_users", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        """Roster rows become users who can log in"""
+        new_test_user("taken")
+        path = self.write(
+            ".csv",
+            "username,password,email,first_name,last_name\n"
+            "b6510000001,pass-one,one@ku.th,One,Student\n"
+            "taken,pass-two,,,\n"
+            "b6510000003,,,,\n"
+            "b6510000001,again,,,\n"
+            "bad name!,pass,,,\n",
+        )
+        out, err = self.run_import(path, "--workers", "2", "--batch-size", "2")
+
+        self.assertIn("Imported 2 user(s), skipped 2 existing, 1 error(s)", out)
+        self.assertIn("users/s", out)
+        self.assertIn("Line 6: username:", err)
+        user = User.objects.get(username="b6510000001")
+        self.assertEqual("one@ku.th", user.email)
+        self.assertTrue(user.check_password("pass-one"))
+        self.assertFalse(
+            User.objects.get(username="b6510000003").has_usable_password()
+        )
+        self.assertTrue(
+            self.client.login(username="b6510000001", password="pass-one")
+        )
+
+    def test_import_jsonl_in_process(self):
+        path = self.write(
+            ".jsonl",
+            json.dumps({"username": "student", "password": "secret"}) + "\n",
+        )
+        out, _ = self.run_import(path, "--workers", "1")
+        self.assertIn("Imported 1 user(s)", out)
+        user = User.objects.get(username="student")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+
+    def test_deferred_hashing_upgraded_on_login(self):
+        """Provisional hashes are replaced when users first log in"""
+        path = self.write(".csv", "username,password\nstudent,secret\n")
+        self.run_import(path, "--defer-hashing")
+        user = User.objects.get(username="student")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256_provisional$"))
+
+        self.assertTrue(
+            self.client.login(username="student", password="secret")
+        )
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(user.check_password("secret"))
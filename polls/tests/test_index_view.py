@@ -1,6 +1,9 @@
 """Tests for Index view"""
-from django.test import TestCase, Client
+import base64
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from polls.pagination import encode_cursor
 from polls.tests.utils import (
     new_question_with_relative_date,
     new_test_user,
@@ -9,6 +12,7 @@ from polls.tests.utils import (
 
 class TestIndexView(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = new_test_user("test")
 
@@ -38,3 +42,85 @@ class TestIndexView(TestCase):
         future.save()
         resp = self.client.get(reverse("polls:index"))
         self.assertQuerysetEqual(resp.context["latest_questions"], [past])
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_keyset_pagination(self):
+        """Pages follow each other by cursor, newest first"""
+        questions = [
+            new_question_with_relative_date(f"{i}", -i) for i in range(5)
+        ]
+        url = reverse("polls:index")
+
+        resp = self.client.get(url)
+        page = resp.context["latest_questions"]
+        self.assertEqual(list(page), questions[:2])
+        self.assertTrue(page.has_next)
+
+        resp = self.client.get(url, {"after": page.next_cursor})
+        page = resp.context["latest_questions"]
+        self.assertEqual(list(page), questions[2:4])
+
+        resp = self.client.get(url, {"after": page.next_cursor})
+        page = resp.context["latest_questions"]
+        self.assertEqual(list(page), questions[4:])
+        self.assertFalse(page.has_next)
+
+    def test_same_publish_date_is_paginated_by_id(self):
+        """Questions published at the same time are not skipped"""
+        first = new_question_with_relative_date("A", -1)
+        second = new_question_with_relative_date("B")
+        second.publish_date = first.publish_date
+        second.save()
+
+        resp = self.client.get(
+            reverse("polls:index"), {"after": encode_cursor(second)}
+        )
+        self.assertEqual(list(resp.context["latest_questions"]), [first])
+
+    def test_invalid_cursor(self):
+        """A malformed cursor returns 404"""
+        resp = self.client.get(reverse("polls:index"), {"after": "???"})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_unusable_cursor(self):
+        """Cursors with out of range keys or naive dates return 404"""
+        for raw in (
+            f"2024-01-01T00:00:00+00:00|{2**63}",
+            f"2024-01-01T00:00:00+00:00|{-2**63 - 1}",
+            "2024-01-01T00:00:00|1",
+            "0001-01-01T00:00:00+05:00|1",
+        ):
+            with self.subTest(raw=raw):
+                cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+                resp = self.client.get(
+                    reverse("polls:index"), {"after": cursor}
+                )
+                self.assertEqual(resp.status_code, 404)
+
+    def test_list_is_served_from_cache(self):
+        """A cached page does not query questions again"""
+        new_question_with_relative_date("Cached", -1)
+        url = reverse("polls:index")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            resp = self.client.get(url)
+        self.assertContains(resp, "Cached")
+
+    def test_saving_question_invalidates_cache(self):
+        """Edited questions are shown right away"""
+        question = new_question_with_relative_date("Before", -1)
+        url = reverse("polls:index")
+        self.client.get(url)
+        question.question_text = "After"
+        question.save()
+        self.assertContains(self.client.get(url), "After")
+
+    def test_greeting_is_not_cached(self):
+        """Cached list is shared, but the greeting is personal"""
+        new_question_with_relative_date("Shared", -1)
+        url = reverse("polls:index")
+        self.client.get(url)
+        self.client.force_login(self.user)
+        resp = self.client.get(url)
+        self.assertContains(resp, "Hello, test.")
+        self.assertContains(resp, "Shared")
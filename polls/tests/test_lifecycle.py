@@ -0,0 +1,112 @@
+"""Tests for bulk lifecycle operations on polls"""
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from polls import lifecycle
+from polls.cache import bump_index_version, get_index_version
+from polls.models import Question, Status
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+    vote,
+)
+
+
+class TestLifecycle(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.open = [new_question_with_relative_date(f"{i}") for i in range(3)]
+        self.ended = new_question_with_relative_date("Ended", -5, -1)
+        self.future = new_question_with_relative_date("Future", 5)
+
+    def test_close_is_one_statement(self):
+        """Closing many polls is a single UPDATE"""
+        with CaptureQueriesContext(connection) as ctx:
+            count = lifecycle.close(Question.objects.all())
+        updates = [
+            q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(1, len(updates))
+        # Polls that ended already keep their end date
+        self.assertEqual(4, count)
+        self.assertEqual(0, Question.objects.open_for_voting().count())
+
+    def test_publish_and_hide(self):
+        """Publishing opens polls for voting, hiding unpublishes them"""
+        lifecycle.publish(Question.objects.filter(pk=self.ended.pk))
+        lifecycle.publish(Question.objects.filter(pk=self.future.pk))
+        self.assertEqual(5, Question.objects.open_for_voting().count())
+
+        lifecycle.hide(Question.objects.filter(pk__in=[self.ended.pk]))
+        self.assertEqual(4, Question.objects.published().count())
+
+    def test_publish_hidden_later(self):
+        """Hidden drafts are published from the date given"""
+        [copy] = lifecycle.clone(Question.objects.filter(pk=self.ended.pk))
+        when = timezone.now() + datetime.timedelta(days=1)
+        lifecycle.publish(Question.objects.filter(pk=copy.pk), when)
+
+        copy.refresh_from_db()
+        self.assertEqual(when, copy.publish_date)
+        self.assertEqual(Status.SCHEDULED, copy.status)
+
+    def test_clone_copies_choices_without_votes(self):
+        """Clones are hidden copies with the same choices and no votes"""
+        vote(new_choice(self.ended, "Yes"), new_test_user("voter"))
+        new_choice(self.ended, "No")
+
+        [copy] = lifecycle.clone(Question.objects.filter(pk=self.ended.pk))
+
+        self.assertEqual("Ended", copy.question_text)
+        self.assertFalse(copy.visibilty)
+        self.assertIsNone(copy.end_date)
+        self.assertEqual(
+            [("Yes", 0), ("No", 0)],
+            list(
+                copy.choice_set.order_by("pk").values_list(
+                    "choice_text", "vote_count"
+                )
+            ),
+        )
+
+    def test_index_cache_invalidated_once(self):
+        """The index is invalidated after the operation commits"""
+        version = get_index_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            lifecycle.close(Question.objects.all())
+        self.assertEqual(1, callbacks.count(bump_index_version))
+        self.assertNotEqual(version, get_index_version())
+
+    def test_admin_action(self):
+        """Admin actions change the selected polls"""
+        admin = User.objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        resp = self.client.post(
+            reverse("admin:polls_question_changelist"),
+            {
+                "action": "hide_polls",
+                "_selected_action": [q.pk for q in self.open],
+            },
+            follow=True,
+        )
+        self.assertContains(resp, "Hid 3 poll(s).")
+        self.assertEqual(0, Question.objects.open_for_voting().count())
+
+    def test_command(self):
+        """The command closes polls selected by state"""
+        out = StringIO()
+        call_command("polls_lifecycle", "close", state="open", stdout=out)
+        self.assertIn("Closed 3 poll(s).", out.getvalue())
+        self.assertEqual(0, Question.objects.open_for_voting().count())
+
+        with self.assertRaises(CommandError):
+            call_command("polls_lifecycle", "hide", stdout=out)
@@ -0,0 +1,49 @@
+"""Tests for polls_bench command"""
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+from polls.models import Choice, Question, VoteData
+
+
+class TestPollsBench(TransactionTestCase):
+    @override_settings(POLLS_USER_CACHE_TIMEOUT=0)
+    def test_seed_and_report(self):
+        """Seeds the dataset and reports every view"""
+        out = StringIO()
+        call_command(
+            "polls_bench",
+            seed=True,
+            questions=20,
+            choices=3,
+            users=5,
+            votes=60,
+            batch_size=7,
+            requests=4,
+            concurrency=1,
+            views="index,details,results,mixed",
+            stdout=out,
+            stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(Choice.objects.count(), 60)
+        # Requests to the mixed view may add votes of their own
+        votes = VoteData.objects.count()
+        self.assertGreaterEqual(votes, 60)
+        self.assertEqual(
+            sum(Choice.objects.values_list("vote_count", flat=True)), votes
+        )
+        self.assertEqual(report["dataset"]["votes"], 60)
+        for view in ("index", "details", "results", "mixed"):
+            self.assertEqual(report["views"][view]["requests"], 4)
+            self.assertGreater(report["views"][view]["queries"], 0)
+
+    def test_too_many_votes(self):
+        """Votes can't outnumber the (user, question) pairs"""
+        with self.assertRaises(CommandError):
+            call_command(
+                "polls_bench", seed=True, questions=1, users=1, votes=2
+            )
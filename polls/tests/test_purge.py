@@ -0,0 +1,134 @@
+"""Tests for batched deletion of polls"""
+import threading
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from polls import lifecycle
+from polls.models import Choice, Question, Status, VoteData
+from polls.purge import get_progress, purge, purge_in_background
+from polls.tests.utils import (
+    new_choice,
+    new_question_with_relative_date,
+    new_test_user,
+    vote,
+)
+
+
+def new_poll(votes):
+    question = new_question_with_relative_date("Big poll")
+    yes = new_choice(question, "Yes")
+    no = new_choice(question, "No")
+    for i in range(votes):
+        vote(yes if i % 2 else no, new_test_user(f"{question.pk}-{i}"))
+    return question
+
+
+class TestPurge(TestCase):
+    def test_purge_deletes_in_batches(self):
+        """Ballots go batch by batch, the question is hidden meanwhile"""
+        question = new_poll(5)
+        other = new_poll(1)
+        seen = []
+
+        def progress(deleted, total):
+            status = Question.objects.get(pk=question.pk).status
+            seen.append((deleted, total, status, get_progress(question.pk)))
+
+        self.assertEqual(5, purge(question.pk, 2, progress))
+
+        self.assertEqual([0, 2, 4, 5], [s[0] for s in seen])
+        self.assertEqual({5}, {s[1] for s in seen})
+        self.assertEqual({Status.HIDDEN}, {s[2] for s in seen})
+        self.assertEqual({"deleted": 4, "total": 5}, seen[2][3])
+        self.assertFalse(Question.objects.filter(pk=question.pk).exists())
+        self.assertFalse(Choice.objects.filter(question=question).exists())
+        self.assertEqual(1, VoteData.objects.filter(question=other).count())
+        self.assertIsNone(get_progress(question.pk))
+
+    def test_command(self):
+        question = new_poll(3)
+        out = StringIO()
+        call_command(
+            "purge_polls", question.pk, "--batch-size", "2", stdout=out
+        )
+        self.assertIn("2 of 3 ballot(s) deleted", out.getvalue())
+        self.assertIn(f"Question {question.pk} deleted.", out.getvalue())
+        self.assertFalse(Question.objects.filter(pk=question.pk).exists())
+
+    def test_command_unknown_question(self):
+        with self.assertRaises(CommandError):
+            call_command("purge_polls", 9999, stdout=StringIO())
+
+    def test_purging_is_marked(self):
+        """Polls purged in the background are marked until deleted"""
+        question = new_poll(1)
+        # Not started, the thread waits for a commit that never comes
+        purge_in_background([question.pk])
+        question.refresh_from_db()
+        self.assertTrue(question.purging)
+        self.assertEqual(Status.HIDDEN, question.status)
+
+    def test_purging_polls_stay_hidden(self):
+        """Polls being purged cannot be published or voted on"""
+        question = new_poll(1)
+        purge_in_background([question.pk])
+        self.assertEqual(0, lifecycle.publish(Question.objects.all()))
+        question.refresh_from_db()
+        self.assertEqual(Status.HIDDEN, question.status)
+        question.visibilty = True
+        question.status = Status.OPEN
+        self.assertFalse(question.can_vote())
+        question.purging = False
+        self.assertTrue(question.can_vote())
+
+    def test_command_resumes_purges(self):
+        """Purges cut short are finished with --resume"""
+        question = new_poll(2)
+        other = new_poll(1)
+        Question.objects.filter(pk=question.pk).update(purging=True)
+        out = StringIO()
+        call_command("purge_polls", "--resume", stdout=out)
+        self.assertIn(f"Question {question.pk} deleted.", out.getvalue())
+        self.assertFalse(Question.objects.filter(pk=question.pk).exists())
+        self.assertTrue(Question.objects.filter(pk=other.pk).exists())
+
+    def test_command_requires_questions(self):
+        with self.assertRaises(CommandError):
+            call_command("purge_polls", stdout=StringIO())
+
+    def test_advance_polls_resumes_purges(self):
+        question = new_poll(2)
+        Question.objects.filter(pk=question.pk).update(purging=True)
+        out = StringIO()
+        call_command("advance_polls", stdout=out)
+        self.assertIn("Finished purging 1 poll(s).", out.getvalue())
+        self.assertFalse(Question.objects.filter(pk=question.pk).exists())
+
+
+class TestAdminPurge(TransactionTestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        self.question = new_poll(4)
+
+    def join_purges(self):
+        for thread in threading.enumerate():
+            if thread.name == "polls-purge":
+                thread.join()
+
+    def test_delete_confirmation_does_not_list_ballots(self):
+        url = reverse("admin:polls_question_delete", args=(self.question.pk,))
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertNotContains(response, "voting for")
+
+    def test_admin_delete_purges_in_background(self):
+        """Deleting from the admin hides the poll and purges it"""
+        url = reverse("admin:polls_question_delete", args=(self.question.pk,))
+        self.client.post(url, {"post": "yes"})
+        self.join_purges()
+        self.assertFalse(Question.objects.filter(pk=self.question.pk).exists())
+        self.assertFalse(VoteData.objects.exists())
@@ -0,0 +1,124 @@
+"""Tests for per-view SQL query budgets"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+from polls.models import Question
+from polls.querybudget import QueryBudgetExceeded, QueryLog, query_budget
+from polls.tests.utils import (
+    assert_within_query_budget,
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+    vote,
+)
+
+
+@override_settings(POLLS_QUERY_BUDGET="raise")
+class TestQueryBudget(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = new_test_user("test")
+        self.client.force_login(self.user)
+        self.question = new_question_with_relative_date("Budget")
+
+    def add_choices(self, start, stop):
+        """Adds choices numbered start to stop with a vote each"""
+        for i in range(start, stop):
+            choice = new_choice(self.question, f"{i}")
+            vote(choice, new_test_user(f"user{i}"))
+        cache.clear()
+
+    def requests(self):
+        """Returns responses of a request to every budgeted view"""
+        args = (self.question.id,)
+        return [
+            self.client.get(reverse("polls:index")),
+            self.client.get(reverse("polls:details", args=args)),
+            self.client.get(reverse("polls:results", args=args)),
+            self.client.get(reverse("polls:results_api", args=args)),
+            self.client.post(
+                reverse("polls:vote", args=args),
+                {"choice": self.question.choice_set.first().pk},
+            ),
+        ]
+
+    def test_views_stay_within_budget(self):
+        """Views stay within their budgets for 2 or 50 choices"""
+        self.add_choices(0, 2)
+        self.client.force_login(self.user)  # Session cached again
+        small = self.requests()
+        self.add_choices(2, 50)
+        self.client.force_login(new_test_user("another"))  # A first vote
+        large = self.requests()
+        for s, la in zip(small, large):
+            assert_within_query_budget(self, s)
+            assert_within_query_budget(self, la)
+            self.assertEqual(len(s.query_log), len(la.query_log))
+
+    def test_queries_record_view_and_template(self):
+        """Recorded queries name the view and template making them"""
+        log = self.client.get(reverse("polls:index")).query_log
+        self.assertEqual({"polls:index"}, {q["view"] for q in log.queries})
+        # The page of questions is only fetched when it is rendered
+        self.assertIn("polls/index.html", {q["template"] for q in log.queries})
+
+    def test_over_budget_raises(self):
+        """Requests over budget raise QueryBudgetExceeded"""
+        with self.settings(ROOT_URLCONF=__name__):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/over-budget/")
+
+    @override_settings(POLLS_QUERY_BUDGET="warn")
+    def test_over_budget_warns(self):
+        """Requests over budget log their queries"""
+        with self.settings(ROOT_URLCONF=__name__):
+            with self.assertLogs("polls.querybudget", "WARNING") as logs:
+                resp = self.client.get("/over-budget/")
+        self.assertEqual(200, resp.status_code)
+        self.assertIn("over its budget of 1", logs.output[0])
+        self.assertIn("repeated 2 times", logs.output[0])
+
+    @override_settings(POLLS_QUERY_BUDGET="off")
+    def test_off_records_nothing(self):
+        url = reverse("polls:index")
+        self.assertFalse(hasattr(self.client.get(url), "query_log"))
+
+    async def test_concurrent_async_requests(self):
+        """Concurrent async requests only record their own queries"""
+        with self.settings(ROOT_URLCONF=__name__):
+            one, three = await asyncio.gather(
+                self.async_client.get("/queries/1/"),
+                self.async_client.get("/queries/3/"),
+            )
+        self.assertEqual(1, len(one.query_log))
+        self.assertEqual(3, len(three.query_log))
+
+    def test_repeated_queries(self):
+        log = QueryLog()
+        log.queries = [{"sql": "SELECT 1"}, {"sql": "SELECT 1"}, {"sql": "B"}]
+        self.assertEqual({"SELECT 1": 2}, log.repeated())
+
+
+@query_budget(1)
+def over_budget(request):
+    list(Question.objects.all())
+    list(Question.objects.all())
+    return HttpResponse()
+
+
+@query_budget(3)
+async def queries(request, count):
+    for _ in range(count):
+        # Lets the other request run its queries in between
+        await asyncio.sleep(0.01)
+        await sync_to_async(Question.objects.count)()
+    return HttpResponse()
+
+
+urlpatterns = [
+    path("over-budget/", over_budget),
+    path("queries/<int:count>/", queries),
+]
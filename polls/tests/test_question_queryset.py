@@ -0,0 +1,77 @@
+"""Tests for Question queryset"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import Question
+from polls.tests.utils import new_question_with_relative_date
+
+
+class TestQuestionQuerySet(TestCase):
+    def setUp(self):
+        self.open = new_question_with_relative_date("Open", -1)
+        self.ending = new_question_with_relative_date("Ending", -1, 1)
+        self.closed = new_question_with_relative_date("Closed", -2, -1)
+        self.future = new_question_with_relative_date("Future", 1)
+        self.hidden = new_question_with_relative_date("Hidden", -1)
+        self.hidden.visibilty = False
+        self.hidden.save()
+
+    def test_published_matches_is_published(self):
+        """published() returns the same questions as is_published()"""
+        expected = {q.id for q in Question.objects.all() if q.is_published()}
+        self.assertEqual(
+            expected,
+            set(Question.objects.published().values_list("id", flat=True)),
+        )
+
+    def test_open_for_voting_matches_can_vote(self):
+        """open_for_voting() returns the same questions as can_vote()"""
+        expected = {q.id for q in Question.objects.all() if q.can_vote()}
+        self.assertEqual(
+            expected,
+            set(
+                Question.objects.open_for_voting().values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+    def test_closed(self):
+        """closed() returns published questions that have ended"""
+        self.assertQuerysetEqual(Question.objects.closed(), [self.closed])
+
+
+class TestQuestionQueryCost(TestCase):
+    """
+    Query cost of views listing questions must stay flat
+    when the question table grows.
+    """
+
+    def setUp(self):
+        self.client = Client()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return len(ctx.captured_queries)
+
+    def test_index_query_count_is_flat(self):
+        """Index view uses the same amount of queries for 1 or 50 polls"""
+        url = reverse("polls:index")
+        new_question_with_relative_date("", -1)
+        small = self.count_queries(url)
+        for _ in range(49):
+            new_question_with_relative_date("", -1)
+        self.assertEqual(small, self.count_queries(url))
+
+    def test_results_query_count_is_flat(self):
+        """Results view does not scan every question to find a poll"""
+        question = new_question_with_relative_date("", -1)
+        url = reverse("polls:results", args=(question.id,))
+        small = self.count_queries(url)
+        for _ in range(49):
+            new_question_with_relative_date("", -1)
+        self.assertEqual(small, self.count_queries(url))
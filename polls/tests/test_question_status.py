@@ -0,0 +1,112 @@
+"""Tests for the lifecycle status of questions"""
+import datetime
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from polls import lifecycle
+from polls.cache import get_index_version, get_results_version
+from polls.models import Question, Status, VoteData
+from polls.tests.utils import (
+    new_choice,
+    new_question_with_relative_date,
+    new_test_user,
+)
+
+
+class TestQuestionStatus(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_status_is_set_on_save(self):
+        """Saving a question computes its status from its dates"""
+        self.assertEqual(
+            Status.OPEN, new_question_with_relative_date("").status
+        )
+        self.assertEqual(
+            Status.SCHEDULED, new_question_with_relative_date("", 1).status
+        )
+        self.assertEqual(
+            Status.CLOSED,
+            new_question_with_relative_date("", -2, -1).status,
+        )
+        question = new_question_with_relative_date("")
+        question.visibilty = False
+        question.save(update_fields=["visibilty"])
+        question.refresh_from_db()
+        self.assertEqual(Status.HIDDEN, question.status)
+
+    def test_advance_opens_and_closes_due_polls(self):
+        """Polls move on once their publish or end date has passed"""
+        opening = new_question_with_relative_date("Opening", 1)
+        closing = new_question_with_relative_date("Closing", -1, 1)
+        later = timezone.now() + datetime.timedelta(days=1, minutes=1)
+
+        ids = Question.objects.advance(later)
+
+        self.assertEqual({opening.pk, closing.pk}, set(ids))
+        opening.refresh_from_db()
+        closing.refresh_from_db()
+        self.assertEqual(Status.OPEN, opening.status)
+        self.assertEqual(Status.CLOSED, closing.status)
+        self.assertEqual([], Question.objects.advance(later))
+
+    def test_no_votes_past_end_date(self):
+        """Votes are refused once a poll ends, before its status changes"""
+        question = new_question_with_relative_date("Ending", -1, 1)
+        choice = new_choice(question, "Yes")
+        Question.objects.filter(pk=question.pk).update(
+            end_date=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        question.refresh_from_db()
+        self.assertEqual(Status.OPEN, question.status)
+        self.assertFalse(question.can_vote())
+
+        self.client.force_login(new_test_user("late"))
+        response = self.client.post(
+            reverse("polls:vote", args=(question.pk,)), {"choice": choice.pk}
+        )
+        self.assertRedirects(
+            response,
+            reverse("polls:results", args=(question.pk,)),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(VoteData.objects.exists())
+
+    def test_next_transition(self):
+        """The next transition is the earliest publish or end date due"""
+        self.assertIsNone(Question.objects.next_transition())
+        opening = new_question_with_relative_date("Opening", 2)
+        closing = new_question_with_relative_date("Closing", -1, 1)
+        self.assertEqual(closing.end_date, Question.objects.next_transition())
+        closing.delete()
+        self.assertEqual(
+            opening.publish_date, Question.objects.next_transition()
+        )
+
+    def test_transitions_invalidate_caches(self):
+        """Advancing polls invalidates the index and their results"""
+        question = new_question_with_relative_date("", -1, 1)
+        Question.objects.filter(pk=question.pk).update(
+            end_date=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        index = get_index_version()
+        results = get_results_version(question.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual([question.pk], lifecycle.advance())
+
+        self.assertNotEqual(index, get_index_version())
+        self.assertNotEqual(results, get_results_version(question.pk))
+
+    def test_command(self):
+        question = new_question_with_relative_date("", 1)
+        Question.objects.filter(pk=question.pk).update(
+            publish_date=timezone.now()
+        )
+        out = StringIO()
+        call_command("advance_polls", stdout=out)
+        self.assertIn("Advanced 1 poll(s).", out.getvalue())
+        self.assertTrue(Question.objects.open_for_voting().exists())
@@ -0,0 +1,32 @@
+"""Tests for rebuild_vote_counts command"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from polls.models import Choice, VoteData
+from polls.tests.utils import (
+    new_question,
+    new_choice,
+    new_test_user,
+)
+
+
+class TestRebuildVoteCounts(TestCase):
+    def test_drifted_counters_are_repaired(self):
+        """Counters are recounted from VoteData, across several chunks"""
+        question = new_question("", timezone.now())
+        choices = [new_choice(question, f"{i}") for i in range(5)]
+        for i, choice in enumerate(choices):
+            for j in range(i):
+                user = new_test_user(f"user{i}-{j}")
+                VoteData.objects.create(user=user, choice=choice)
+        Choice.objects.filter(pk=choices[0].pk).update(vote_count=42)
+
+        out = StringIO()
+        call_command("rebuild_vote_counts", chunk_size=2, stdout=out)
+
+        self.assertEqual(
+            [0, 1, 2, 3, 4],
+            [Choice.objects.get(pk=c.pk).vote_count for c in choices],
+        )
+        self.assertIn("5 choice(s) fixed", out.getvalue())
@@ -0,0 +1,137 @@
+"""Tests for result snapshots of closed polls"""
+import datetime
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from polls import lifecycle
+from polls.cache import get_results_version
+from polls.models import Choice, Question, ResultSnapshot
+from polls.results import compute_many
+from polls.snapshots import refresh_snapshots
+from polls.tests.utils import (
+    assert_within_query_budget,
+    new_choice,
+    new_question_with_relative_date,
+    new_test_user,
+    vote,
+)
+
+
+@override_settings(POLLS_QUERY_BUDGET="raise")
+class TestResultSnapshots(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = new_question_with_relative_date("Closing", -2, 1)
+        self.yes = new_choice(self.question, "Yes")
+        self.no = new_choice(self.question, "No")
+        for i in range(3):
+            vote(self.yes, new_test_user(f"yes{i}"))
+        vote(self.no, new_test_user("no"))
+
+    def close(self):
+        lifecycle.close(Question.objects.filter(pk=self.question.pk))
+
+    def test_closing_takes_snapshot(self):
+        """Closing a poll stores its per-choice totals and percentages"""
+        self.close()
+        data = ResultSnapshot.objects.get(question=self.question).data
+        self.assertEqual(4, data["total_votes"])
+        self.assertEqual(
+            [("Yes", 3, 75), ("No", 1, 25)],
+            [
+                (r["choice_text"], r["votes"], r["percentage"])
+                for r in data["results"]
+            ],
+        )
+
+    def test_advance_takes_snapshot(self):
+        """Polls closed by the scheduler get a snapshot"""
+        later = timezone.now() + datetime.timedelta(days=1, minutes=1)
+        lifecycle.advance(later)
+        self.assertTrue(
+            ResultSnapshot.objects.filter(question=self.question).exists()
+        )
+
+    def test_results_served_from_snapshot(self):
+        """Results of closed polls are not counted again"""
+        self.close()
+        # Counters changed behind the snapshot's back are not seen
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=100)
+        response = self.client.get(
+            reverse("polls:results", args=(self.question.pk,))
+        )
+        self.assertEqual(4, response.context["total_votes"])
+        assert_within_query_budget(self, response)
+        response = self.client.get(
+            reverse("polls:results_api", args=(self.question.pk,))
+        )
+        self.assertEqual(4, response.json()["total_votes"])
+        self.assertEqual("closed", response.json()["state"])
+
+    def test_closed_results_cached(self):
+        """Snapshots are read once while the results version holds"""
+        self.close()
+        url = reverse("polls:results_api", args=(self.question.pk,))
+        self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="other")
+        self.assertEqual(1, len(response.query_log))
+
+    def test_reopening_removes_snapshot(self):
+        """Publishing a closed poll again removes its snapshot"""
+        self.close()
+        lifecycle.publish(Question.objects.filter(pk=self.question.pk))
+        self.assertFalse(
+            ResultSnapshot.objects.filter(question=self.question).exists()
+        )
+
+    def test_hiding_removes_snapshot(self):
+        self.close()
+        lifecycle.hide(Question.objects.filter(pk=self.question.pk))
+        self.assertFalse(
+            ResultSnapshot.objects.filter(question=self.question).exists()
+        )
+
+    def test_editing_closed_poll_rebuilds_snapshot(self):
+        """Choices edited on a closed poll are in a new snapshot"""
+        self.close()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.no.choice_text = "Nope"
+            self.no.save()
+        data = ResultSnapshot.objects.get(question=self.question).data
+        self.assertEqual("Nope", data["results"][1]["choice_text"])
+
+    def test_saving_reopened_poll_removes_snapshot(self):
+        """Moving the end date of a closed poll reopens it"""
+        self.close()
+        self.question.refresh_from_db()
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.save()
+        self.assertFalse(
+            ResultSnapshot.objects.filter(question=self.question).exists()
+        )
+
+    def test_many_questions_notified_at_once(self):
+        """Results of every question refreshed are invalidated together"""
+        others = [new_question_with_relative_date(f"{i}") for i in range(3)]
+        ids = [self.question.pk] + [q.pk for q in others]
+        before = [get_results_version(pk) for pk in ids]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            refresh_snapshots(ids)
+        self.assertEqual(1, len(callbacks))
+        for pk, version in zip(ids, before):
+            self.assertGreater(get_results_version(pk), version)
+
+    def test_compute_many_is_one_query(self):
+        """Results of many questions are counted with a single query"""
+        other = new_question_with_relative_date("Other")
+        new_choice(other, "Maybe")
+        with CaptureQueriesContext(connection) as ctx:
+            results = compute_many([self.question.pk, other.pk])
+        self.assertEqual(1, len(ctx.captured_queries))
+        self.assertEqual(4, results[self.question.pk]["total_votes"])
+        self.assertEqual(0, results[other.pk]["total_votes"])
+        self.assertEqual(1, len(results[other.pk]["results"]))
@@ -0,0 +1,65 @@
+"""Tests for results_api() view"""
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from polls.models import VoteData
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+
+class TestResultsApi(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = new_test_user("test")
+        self.question = new_question_with_relative_date("Eggs?")
+        self.choice = new_choice(self.question, "Scrambled")
+        new_choice(self.question, "Boiled")
+        self.url = reverse("polls:results_api", args=(self.question.id,))
+
+    def test_results_json(self):
+        """Returns counts, totals and state of a poll"""
+        VoteData.objects.cast_vote(self.user, self.choice)
+        resp = self.client.get(self.url)
+        data = resp.json()
+
+        self.assertEqual(data["state"], "open")
+        self.assertEqual(data["total_votes"], 1)
+        self.assertEqual(
+            [(c["choice_text"], c["votes"]) for c in data["choices"]],
+            [("Scrambled", 1), ("Boiled", 0)],
+        )
+        self.assertTrue(resp["ETag"].startswith('"'))  # Strong ETag
+
+    def test_unchanged_results_return_304(self):
+        """A matching If-None-Match costs a single question lookup"""
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+    def test_vote_changes_etag(self):
+        """Voting through the vote view changes the ETag"""
+        etag = self.client.get(self.url)["ETag"]
+        self.user.set_password("1234")
+        self.user.save()
+        self.client.login(username="test", password="1234")
+        self.client.post(
+            reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice.id},
+        )
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["total_votes"], 1)
+
+    def test_unpublished_question_returns_404(self):
+        """Unpublished questions have no results"""
+        question = new_question_with_relative_date("", 1)
+        url = reverse("polls:results_api", args=(question.id,))
+        self.assertEqual(self.client.get(url).status_code, 404)
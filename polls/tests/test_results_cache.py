@@ -0,0 +1,101 @@
+"""Tests for cached poll results"""
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from polls.cache import bump_results_version, get_or_recompute
+from polls.results import compute_results, get_results
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+    vote,
+)
+
+
+class TestComputeResults(TestCase):
+    def test_totals_and_percentages(self):
+        """Results have per-choice votes, percentages and a total"""
+        question = new_question_with_relative_date("")
+        a = new_choice(question, "A")
+        b = new_choice(question, "B")
+        new_choice(question, "C")
+        for i in range(3):
+            vote(a, new_test_user(f"a{i}"))
+        vote(b, new_test_user("b"))
+
+        with self.assertNumQueries(1):
+            data = compute_results(question.id)
+
+        self.assertEqual(data["total_votes"], 4)
+        rows = [
+            (r["choice_text"], r["votes"], r["percentage"])
+            for r in data["results"]
+        ]
+        self.assertEqual(rows, [("A", 3, 75.0), ("B", 1, 25.0), ("C", 0, 0)])
+
+    def test_no_votes(self):
+        """Percentages are zero when nobody voted"""
+        question = new_question_with_relative_date("")
+        new_choice(question, "A")
+        data = compute_results(question.id)
+        self.assertEqual(data["total_votes"], 0)
+        self.assertEqual(data["results"][0]["percentage"], 0)
+
+
+class TestResultsCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = new_test_user("test")
+        self.user.set_password("1234")
+        self.user.save()
+
+    def test_results_are_served_from_cache(self):
+        """A second read of fresh results does not query the database"""
+        question = new_question_with_relative_date("")
+        new_choice(question, "A")
+        get_results(question.id)
+        with self.assertNumQueries(0):
+            get_results(question.id)
+
+    def test_vote_invalidates_results(self):
+        """Voting bumps the results version so the new vote is shown"""
+        self.client.login(username="test", password="1234")
+        question = new_question_with_relative_date("")
+        choice = new_choice(question, "A")
+        self.assertEqual(get_results(question.id)["total_votes"], 0)
+
+        url = reverse("polls:vote", args=(question.id,))
+        resp = self.client.post(url, {"choice": choice.id}, follow=True)
+
+        self.assertContains(resp, '<span class="votes">1</span>')
+
+    def test_stale_value_served_while_locked(self):
+        """Only the lock holder recomputes, the others get stale results"""
+        compute = []
+
+        def recompute():
+            compute.append(1)
+            return len(compute)
+
+        self.assertEqual(get_or_recompute("k", 1, recompute, 0), (1, 1))
+        cache.add("k:lock", 1)  # Another worker is recomputing
+        self.assertEqual(get_or_recompute("k", 2, recompute, 0), (1, 1))
+        self.assertEqual(len(compute), 1)
+
+        cache.delete("k:lock")
+        self.assertEqual(get_or_recompute("k", 2, recompute, 0), (2, 2))
+
+    def test_choice_changes_invalidate_results(self):
+        """Adding a choice is visible in cached results"""
+        question = new_question_with_relative_date("")
+        new_choice(question, "A")
+        get_results(question.id)
+        new_choice(question, "B")
+        self.assertEqual(len(get_results(question.id)["results"]), 2)
+
+    def test_bump_without_version(self):
+        """Bumping a missing version still creates a new one"""
+        with patch("polls.cache.cache.incr", side_effect=ValueError):
+            self.assertIsNotNone(bump_results_version(9999))
@@ -0,0 +1,142 @@
+"""Tests for live results streams"""
+import asyncio
+import json
+import threading
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient, Client, override_settings
+from django.urls import reverse
+from polls import lifecycle
+from polls.events import ResultsBus, notify_results_changed
+from polls.models import Choice, Question, VoteData
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+VOTERS = 50
+
+
+def parse_events(chunks):
+    """Returns (id, data) of each results event in chunks of a stream"""
+    events = []
+    for chunk in chunks:
+        fields = dict(
+            line.split(": ", 1)
+            for line in chunk.decode().splitlines()
+            if line and not line.startswith(":")
+        )
+        if fields.get("event") == "results":
+            events.append((int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+class TestResultsBus(TestCase):
+    async def test_notifications_are_coalesced(self):
+        """Many publishes before the subscriber wakes up wake it once"""
+        bus = ResultsBus()
+        sub = bus.subscribe(1)
+        publisher = threading.Thread(
+            target=lambda: [bus.publish(1) for _ in range(100)]
+        )
+        publisher.start()
+        publisher.join()
+
+        self.assertTrue(await sub.wait(1))
+        self.assertFalse(await sub.wait(0.01))
+
+        bus.unsubscribe(sub)
+        self.assertEqual(bus.subscriber_count(1), 0)
+
+    async def test_other_questions_are_not_notified(self):
+        """Subscribers only hear about their question"""
+        bus = ResultsBus()
+        sub = bus.subscribe(1)
+        bus.publish(2)
+        self.assertFalse(await sub.wait(0.01))
+
+
+@override_settings(POLLS_STREAM_MIN_INTERVAL=0, POLLS_STREAM_POLL_INTERVAL=1)
+class TestResultsStream(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = new_question_with_relative_date("")
+        self.choices = [new_choice(self.question, f"{i}") for i in range(3)]
+        self.users = [new_test_user(f"user{i}") for i in range(VOTERS)]
+
+    def cast_votes(self):
+        for i, user in enumerate(self.users):
+            VoteData.objects.cast_vote(user, self.choices[i % 3])
+            notify_results_changed(self.question.id)
+
+    async def test_stream_delivers_ordered_updates_under_load(self):
+        """
+        Every update arrives in version order, and after a burst of votes
+        the stream ends up with the final counts
+        """
+        client = AsyncClient()
+        url = reverse("polls:results_stream", args=(self.question.id,))
+        resp = await client.get(url)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        stream = resp.streaming_content
+
+        events = parse_events([await stream.__anext__()])
+        self.assertEqual(events[0][1]["total_votes"], 0)
+
+        voting = asyncio.create_task(sync_to_async(self.cast_votes)())
+        counts = {}
+        total = 0
+        while total < VOTERS:
+            chunk = await asyncio.wait_for(stream.__anext__(), 5)
+            for version, data in parse_events([chunk]):
+                self.assertGreater(version, events[-1][0])
+                events.append((version, data))
+                counts.update(data["choices"])
+                total = data["total_votes"]
+        await voting
+        await stream.aclose()
+
+        expected = {
+            str(c.id): VOTERS // 3 + (i < VOTERS % 3)
+            for i, c in enumerate(self.choices)
+        }
+        self.assertEqual(counts, expected)
+
+    async def test_unpublished_question_returns_404(self):
+        """Streams are only open for published questions"""
+        question = await sync_to_async(new_question_with_relative_date)(
+            "", 1
+        )
+        url = reverse("polls:results_stream", args=(question.id,))
+        resp = await AsyncClient().get(url)
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_closed_question_streams_snapshot(self):
+        """Streams of closed polls send the results frozen at closing"""
+        await sync_to_async(self.cast_votes)()
+        await sync_to_async(lifecycle.close)(
+            Question.objects.filter(pk=self.question.pk)
+        )
+        # Counters changed behind the snapshot's back are not seen
+        await Choice.objects.filter(pk=self.choices[0].pk).aupdate(
+            vote_count=100
+        )
+        url = reverse("polls:results_stream", args=(self.question.id,))
+        resp = await AsyncClient().get(url)
+        stream = resp.streaming_content
+        events = parse_events([await stream.__anext__()])
+        await stream.aclose()
+        self.assertEqual(events[0][1]["total_votes"], VOTERS)
+
+    def test_wsgi_sends_one_event(self):
+        """Without ASGI, current results are sent and clients reconnect"""
+        self.cast_votes()
+        url = reverse("polls:results_stream", args=(self.question.id,))
+        resp = Client().get(url)
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        self.assertTrue(resp.content.startswith(b"retry: 1000\n"))
+        [(_, data)] = parse_events([resp.content])
+        self.assertEqual(data["total_votes"], VOTERS)
+        self.assertEqual(len(data["choices"]), 3)
@@ -1,5 +1,8 @@
 """Tests for Results view"""
+from django.db import connection
+from django.core.cache import cache
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from polls.tests.utils import (
     new_question_with_relative_date,
@@ -11,6 +14,7 @@ from polls.tests.utils import (
 
 class TestResultsView(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = new_test_user("test")
 
@@ -32,6 +36,22 @@ class TestResultsView(TestCase):
             resp, '<span class="votes">1</span>'
         )  # Checks if the vote is correctly counted
 
+    def test_query_count_does_not_grow_with_choices(self):
+        """Rendering results costs the same queries for 2 or 20 choices"""
+        question = new_question_with_relative_date("")
+        url = reverse("polls:results", args=(question.id,))
+        for i in range(2):
+            vote(new_choice(question, f"{i}"), new_test_user(f"user{i}"))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for i in range(2, 20):
+            vote(new_choice(question, f"{i}"), new_test_user(f"user{i}"))
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries)
+        )
+
     def test_future_question_should_return_404(self):
         """Unpublished questions should return 404 for unauthorized users"""
         question = new_question_with_relative_date("", 1)
@@ -0,0 +1,140 @@
+"""Tests for read replica routing"""
+import tempfile
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from polls.models import Choice, Question
+from polls.routers import PIN_COOKIE, PrimaryPinningMiddleware, ReplicaRouter
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+REPLICAS = ["stand_in1", "stand_in2"]
+
+
+@override_settings(POLLS_READ_REPLICAS=REPLICAS, POLLS_QUERY_BUDGET="raise")
+class TestReplicaRouting(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Stand-in replicas are separate SQLite databases, which only see
+        # rows replicated by hand, so stale reads show up in tests
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        for alias in REPLICAS:
+            connections.settings[alias] = {
+                **connections[DEFAULT_DB_ALIAS].settings_dict,
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": str(Path(cls.replica_dir.name) / f"{alias}.sqlite3"),
+            }
+        # Data migrations read through the router, from the default database
+        with override_settings(POLLS_READ_REPLICAS=[]):
+            for alias in REPLICAS:
+                call_command("migrate", database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.question = new_question_with_relative_date("Replicated?")
+        self.choice = new_choice(self.question, "Yes")
+        # Replicate by hand
+        for alias in REPLICAS:
+            self.question.save(using=alias)
+            self.choice.save(using=alias)
+            self.addCleanup(
+                call_command,
+                "flush",
+                database=alias,
+                interactive=False,
+                verbosity=0,
+            )
+
+    def polls_aliases(self, response):
+        """Returns databases read by queries on polls tables"""
+        return {
+            q["alias"]
+            for q in response.query_log.queries
+            if '"polls_' in q["sql"]
+        }
+
+    def test_router(self):
+        """Polls reads go to replicas unless in a primary transaction"""
+        router = ReplicaRouter()
+        self.assertIn(router.db_for_read(Question), REPLICAS)
+        self.assertIsNone(router.db_for_read(User))
+        self.assertEqual(DEFAULT_DB_ALIAS, router.db_for_write(Question))
+        with transaction.atomic():
+            self.assertEqual(DEFAULT_DB_ALIAS, router.db_for_read(Question))
+
+    @override_settings(POLLS_READ_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Question))
+
+    def test_reads_are_spread_over_replicas(self):
+        url = reverse("polls:details", args=(self.question.id,))
+        aliases = set()
+        for _ in range(20):
+            aliases |= self.polls_aliases(Client().get(url))
+        self.assertEqual(set(REPLICAS), aliases)
+
+    def test_voter_reads_from_primary(self):
+        """After voting, a user's reads stick to the primary"""
+        client = Client()
+        client.force_login(new_test_user("voter"))
+        resp = client.post(
+            reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice.id},
+        )
+        self.assertIn(PIN_COOKIE, resp.cookies)
+
+        resp = client.get(resp.url)
+        self.assertEqual({DEFAULT_DB_ALIAS}, self.polls_aliases(resp))
+        # Replicas have not seen the vote
+        self.assertContains(resp, '<span class="votes">1</span>')
+        replica = Choice.objects.using(REPLICAS[0]).get(pk=self.choice.pk)
+        self.assertEqual(0, replica.vote_count)
+
+        url = reverse("polls:details", args=(self.question.id,))
+        resp = Client().get(url)
+        self.assertTrue(self.polls_aliases(resp) <= set(REPLICAS))
+
+    def test_admin_reads_from_primary(self):
+        client = Client()
+        client.force_login(User.objects.create_superuser("admin", "", "a"))
+        resp = client.get(reverse("admin:polls_question_changelist"))
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual({DEFAULT_DB_ALIAS}, self.polls_aliases(resp))
+
+    async def test_async_writes_read_from_primary(self):
+        """Pinning works the same for requests served with ASGI"""
+
+        async def get_response(request):
+            return HttpResponse(ReplicaRouter().db_for_read(Question))
+
+        middleware = PrimaryPinningMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        resp = await middleware(RequestFactory().post("/"))
+        self.assertEqual(DEFAULT_DB_ALIAS, resp.content.decode())
+        self.assertIn(PIN_COOKIE, resp.cookies)
+        resp = await middleware(RequestFactory().get("/"))
+        self.assertIn(resp.content.decode(), REPLICAS)
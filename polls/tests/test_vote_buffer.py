@@ -0,0 +1,194 @@
+"""Tests for buffered vote ingestion"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from polls.buffer import VoteBuffer, orphaned_logs, process_log_path
+from polls.models import Choice, VoteData
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+
+class TestVoteBuffer(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log = Path(self.tmp.name) / "votes.log"
+        self.buffer = VoteBuffer(self.log, batch_size=2)
+        self.user = new_test_user("test")
+        self.question = new_question_with_relative_date("")
+        self.choice1 = new_choice(self.question, "A")
+        self.choice2 = new_choice(self.question, "B")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def counts(self):
+        return [
+            Choice.objects.get(pk=c.pk).vote_count
+            for c in (self.choice1, self.choice2)
+        ]
+
+    def test_repeated_votes_are_coalesced(self):
+        """Only the last vote of a user on a question is written"""
+        self.buffer.add(self.user.id, self.question.id, self.choice1.id)
+        self.buffer.add(self.user.id, self.question.id, self.choice2.id)
+        self.assertEqual(self.buffer.flush(), 1)
+
+        data = VoteData.objects.get(user=self.user)
+        self.assertEqual(data.choice, self.choice2)
+        self.assertEqual(self.counts(), [0, 1])
+        self.assertFalse(self.log.exists())
+
+    def test_flush_changes_existing_vote(self):
+        """Flushed votes replace the previous vote and move counters"""
+        VoteData.objects.cast_vote(self.user, self.choice1)
+        self.buffer.add(self.user.id, self.question.id, self.choice2.id)
+        self.buffer.flush()
+
+        self.assertEqual(VoteData.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.counts(), [0, 1])
+
+    def test_votes_are_replayed_after_restart(self):
+        """Votes logged but not flushed survive a restart"""
+        other = new_test_user("other")
+        self.buffer.add(self.user.id, self.question.id, self.choice1.id)
+        self.buffer.add(other.id, self.question.id, self.choice2.id)
+
+        restarted = VoteBuffer(self.log)
+        self.assertEqual(
+            restarted.pending_choice(self.user.id, self.question.id),
+            self.choice1.id,
+        )
+        self.assertEqual(restarted.flush(), 2)
+        self.assertEqual(self.counts(), [1, 1])
+
+    def test_failed_flush_keeps_votes(self):
+        """Votes stay queued and logged when writing them fails"""
+        self.buffer.add(self.user.id, self.question.id, self.choice1.id)
+        with patch("polls.buffer.write_votes", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.buffer.add(self.user.id, self.question.id, self.choice2.id)
+
+        self.assertEqual(len(VoteBuffer(self.log)), 1)  # Both files replay
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.counts(), [0, 1])
+
+    def test_votes_of_deleted_choices_are_dropped(self):
+        """A vote for a removed choice does not block the others"""
+        other = new_test_user("other")
+        self.buffer.add(self.user.id, self.question.id, self.choice1.id)
+        self.buffer.add(other.id, self.question.id, 9999)
+        with self.assertLogs("polls.buffer", "WARNING"):
+            self.buffer.flush()
+
+        self.assertEqual(VoteData.objects.count(), 1)
+        self.assertEqual(self.counts(), [1, 0])
+
+    def test_logs_of_dead_processes_are_adopted(self):
+        """Votes logged by a process that died are taken over"""
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+        dead = process_log_path(self.log, finished.pid)
+        dead.write_text(
+            json.dumps([self.user.id, self.question.id, self.choice1.id])
+            + "\n"
+        )
+        alive = process_log_path(self.log, os.getppid())
+        alive.write_text("")
+
+        own = VoteBuffer(process_log_path(self.log))
+        self.assertEqual(orphaned_logs(self.log), [dead])
+        own.adopt(orphaned_logs(self.log))
+
+        self.assertFalse(dead.exists())
+        self.assertTrue(alive.exists())
+        self.assertEqual(
+            own.pending_choice(self.user.id, self.question.id),
+            self.choice1.id,
+        )
+        self.assertEqual(len(VoteBuffer(process_log_path(self.log))), 1)
+        self.assertEqual(own.flush(), 1)
+        self.assertEqual(self.counts(), [1, 0])
+
+    def test_flushing_file_is_adopted_before_log(self):
+        """The vote logged last wins over the one being flushed"""
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+        log = process_log_path(self.log, finished.pid)
+        flushing = log.with_name(log.name + ".flushing")
+        flushing.write_text(
+            json.dumps([self.user.id, self.question.id, self.choice1.id])
+            + "\n"
+        )
+        log.write_text(
+            json.dumps([self.user.id, self.question.id, self.choice2.id])
+            + "\n"
+        )
+
+        own = VoteBuffer(process_log_path(self.log))
+        self.assertEqual(orphaned_logs(self.log), [flushing, log])
+        own.adopt(orphaned_logs(self.log))
+
+        self.assertEqual(
+            own.pending_choice(self.user.id, self.question.id),
+            self.choice2.id,
+        )
+        self.assertEqual(own.flush(), 1)
+        self.assertEqual(self.counts(), [0, 1])
+
+
+class TestBufferedVoteView(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.buffer = VoteBuffer(Path(self.tmp.name) / "votes.log")
+        patcher = patch("polls.views.get_vote_buffer", return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.client = Client()
+        self.user = new_test_user("test")
+        self.user.set_password("1234")
+        self.user.save()
+        self.client.login(username="test", password="1234")
+
+    @override_settings(POLLS_VOTE_BUFFER=True)
+    def test_pending_vote_is_shown_to_voter(self):
+        """The voter sees their vote selected before it is written"""
+        question = new_question_with_relative_date("")
+        choice = new_choice(question, "A")
+
+        self.client.post(
+            reverse("polls:vote", args=(question.id,)), {"choice": choice.id}
+        )
+        self.assertFalse(VoteData.objects.exists())
+
+        resp = self.client.get(reverse("polls:details", args=(question.id,)))
+        self.assertEqual(resp.context["selected_choice"], choice.id)
+
+    @override_settings(POLLS_VOTE_BUFFER=True)
+    def test_pending_vote_is_counted_in_results(self):
+        """Results the voter is sent to count their vote not written yet"""
+        question = new_question_with_relative_date("")
+        first = new_choice(question, "A")
+        second = new_choice(question, "B")
+        VoteData.objects.cast_vote(self.user, first)
+        VoteData.objects.cast_vote(new_test_user("other"), first)
+
+        resp = self.client.post(
+            reverse("polls:vote", args=(question.id,)), {"choice": second.id}
+        )
+        resp = self.client.get(resp.url)
+        self.assertEqual(resp.context["total_votes"], 2)
+        self.assertEqual(
+            [(r["votes"], r["percentage"]) for r in resp.context["results"]],
+            [(1, 50), (1, 50)],
+        )
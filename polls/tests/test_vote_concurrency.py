@@ -0,0 +1,85 @@
+"""Tests for concurrent voting"""
+import itertools
+import threading
+import time
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from polls.bench import run_threaded
+from polls.models import Choice, VoteData
+from polls.tests.utils import (
+    new_question_with_relative_date,
+    new_choice,
+    new_test_user,
+)
+
+THREADS = 8
+VOTES_PER_THREAD = 10
+
+
+class TestVoteConcurrency(TransactionTestCase):
+    def setUp(self):
+        self.user = new_test_user("test")
+        self.question = new_question_with_relative_date("")
+        self.choices = [new_choice(self.question, f"{i}") for i in range(3)]
+
+    def cast_vote(self, choice):
+        while True:
+            try:
+                VoteData.objects.cast_vote(self.user, choice)
+                return
+            except OperationalError:
+                time.sleep(0.001)  # SQLite is locked by a writer
+
+    def assert_one_vote(self):
+        self.assertEqual(
+            VoteData.objects.filter(
+                user=self.user, question=self.question
+            ).count(),
+            1,
+        )
+        counts = Choice.objects.filter(question=self.question).values_list(
+            "vote_count", flat=True
+        )
+        self.assertEqual(sorted(counts), [0, 0, 1])
+
+    def cast_votes(self, barrier, errors, offset):
+        try:
+            barrier.wait()
+            for i in range(VOTES_PER_THREAD):
+                self.cast_vote(self.choices[(offset + i) % len(self.choices)])
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_parallel_votes_leave_one_row(self):
+        """
+        Parallel votes of one user on one question end with exactly one
+        VoteData row and counters adding up to one vote
+        """
+        barrier = threading.Barrier(THREADS)
+        errors = []
+        threads = [
+            threading.Thread(target=self.cast_votes, args=(barrier, errors, i))
+            for i in range(THREADS)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assert_one_vote()
+
+    def test_parallel_vote_throughput(self):
+        """Every vote cast in parallel is measured, none fails"""
+        choices = itertools.cycle(self.choices)
+        total = THREADS * VOTES_PER_THREAD
+        stats = run_threaded(
+            lambda: self.cast_vote(next(choices)), total, THREADS
+        )
+        self.assertEqual(stats["requests"], total)
+        self.assertEqual(stats["errors"], 0)
+        self.assertGreater(stats["throughput"], 0)
+        self.assertGreater(stats["p99_ms"], 0)
+        self.assert_one_vote()
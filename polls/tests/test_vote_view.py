@@ -1,7 +1,7 @@
 """Tests for vote() view"""
 from django.test import TestCase, Client
 from django.urls import reverse
-from polls.models import VoteData
+from polls.models import Choice, VoteData
 from polls.tests.utils import (
     new_question_with_relative_date,
     new_choice,
@@ -79,6 +79,27 @@ class TestVoteView(TestCase):
             fetch_vote().first().choice, choice2
         )  # Checks if VoteData is changed
 
+    def test_vote_counters_follow_changed_vote(self):
+        """Changing a vote moves the count from the old choice to the new"""
+        self.client.login(username=self.user.username, password="1234")
+        question = new_question_with_relative_date("")
+        choice1 = new_choice(question, "A")
+        choice2 = new_choice(question, "B")
+        url = reverse("polls:vote", args=(question.id,))
+
+        def counts():
+            return [
+                Choice.objects.get(pk=c.pk).vote_count
+                for c in (choice1, choice2)
+            ]
+
+        self.client.post(url, post_with(choice1.id))
+        self.assertEqual(counts(), [1, 0])
+        self.client.post(url, post_with(choice1.id))
+        self.assertEqual(counts(), [1, 0])  # Voting again counts once
+        self.client.post(url, post_with(choice2.id))
+        self.assertEqual(counts(), [0, 1])
+
     def test_question_does_not_exist_for_voting(self):
         """When trying to vote for non-existant question, it should return 404"""
         logged_in = self.client.login(
@@ -1,5 +1,6 @@
 """Utilities for testing"""
 import datetime
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth.models import User
 from polls.models import Question, Choice, VoteData
@@ -36,5 +37,16 @@ def new_test_user(username):
 
 
 def vote(choice: Choice, user: User):
-    """Create a new VoteData"""
-    return VoteData.objects.create(choice=choice, user=user)
+    """Create a new VoteData and count it in the choice's vote counter"""
+    data = VoteData.objects.create(choice=choice, user=user)
+    Choice.objects.filter(pk=choice.pk).update(vote_count=F("vote_count") + 1)
+    return data
+
+
+def assert_within_query_budget(testcase, response):
+    """Fails testcase if response went over its view's query budget"""
+    request = getattr(response, "wsgi_request", None) or response.asgi_request
+    budget = getattr(request, "query_budget", None)
+    testcase.assertIsNotNone(budget, "View declares no query budget")
+    log = response.query_log
+    testcase.assertLessEqual(len(log), budget, log.report())
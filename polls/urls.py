@@ -1,11 +1,34 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 
 from . import views
 
+# Async variants of the views serve ASGI deployments without a thread
+# per request.
+if settings.POLLS_ASYNC_VIEWS:
+    details_view = views.AsyncDetailsView.as_view()
+    results_view = views.AsyncResultsView.as_view()
+    vote_view = views.avote
+else:
+    details_view = views.DetailsView.as_view()
+    results_view = views.ResultsView.as_view()
+    vote_view = views.vote
+
 app_name = "polls"
 urlpatterns = [
     path("", views.IndexView.as_view(), name="index"),
-    path("<int:pk>/", views.DetailsView.as_view(), name="details"),
-    path("<int:pk>/results/", views.ResultsView.as_view(), name="results"),
-    path("<int:question_id>/vote/", views.vote, name="vote"),
+    path("<int:pk>/", details_view, name="details"),
+    path("<int:pk>/results/", results_view, name="results"),
+    path("<int:pk>/results.json", views.results_api, name="results_api"),
+    path(
+        "<int:pk>/results/stream/",
+        views.results_stream,
+        name="results_stream",
+    ),
+    path("<int:question_id>/vote/", vote_view, name="vote"),
+    re_path(
+        r"^export/(?P<kind>votes|results)\.(?P<fmt>csv|jsonl)$",
+        views.export,
+        name="export",
+    ),
 ]
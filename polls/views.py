@@ -1,17 +1,40 @@
+import hashlib
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import generic
+from django.views.decorators.http import require_safe
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .models import Question, Choice, VoteData
-
-
-def get_published():
-    """Returns all questions id that are published"""
-    questions = Question.objects.all()
-    return [q.id for q in questions if q.is_published()]
+from .buffer import get_vote_buffer
+from .cache import get_index_version, get_results_version
+from .decorators import aget_user, alogin_required
+from .events import notify_results_changed, results_event, stream_results
+from .export import (
+    CONTENT_TYPES,
+    InvalidFilter,
+    export_rows,
+    iter_lines,
+    parse_when,
+)
+from .models import Question, Choice, Status, VoteData
+from .pagination import InvalidCursor, KeysetPage
+from .querybudget import query_budget
+from .results import get_results, get_versioned_results
 
 
+@query_budget(11)
 @login_required
 def vote(request, question_id):
     """
@@ -38,15 +61,14 @@ def vote(request, question_id):
             "polls/details.html",
             {"question": question},
         )
-    user = request.user
-    try:
-        data = VoteData.objects.get(
-            user=user, choice__in=question.choice_set.all()
-        )
-        data.choice = selected_choice
-        data.save()
-    except VoteData.DoesNotExist:
-        data = VoteData.objects.create(choice=selected_choice, user=user)
+    if not question.can_vote():
+        messages.error(request, "Voting on this poll is closed.")
+        return redirect("polls:results", pk=question_id)
+    if settings.POLLS_VOTE_BUFFER:
+        get_vote_buffer().add(request.user.id, question.id, selected_choice.id)
+    else:
+        VoteData.objects.cast_vote(request.user, selected_choice)
+        notify_results_changed(question.id)
     return redirect("polls:results", pk=question_id)
 
 
@@ -59,11 +81,23 @@ class IndexView(generic.ListView):
 
     template_name = "polls/index.html"
     context_object_name = "latest_questions"
+    query_budget = 3
 
     def get_queryset(self):
-        return Question.objects.filter(id__in=get_published()).order_by(
-            "-publish_date"
-        )
+        try:
+            return KeysetPage(
+                Question.objects.published(),
+                self.request.GET.get("after"),
+                settings.POLLS_INDEX_PAGE_SIZE,
+            )
+        except InvalidCursor:
+            raise Http404("Invalid page")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["index_version"] = get_index_version()
+        context["index_cache_timeout"] = settings.POLLS_INDEX_CACHE_TIMEOUT
+        return context
 
 
 class DetailsView(generic.DetailView):
@@ -75,33 +109,44 @@ class DetailsView(generic.DetailView):
 
     model = Question
     template_name = "polls/details.html"
+    query_budget = 5
+
+    def get_queryset(self):
+        return Question.objects.published().prefetch_related("choice_set")
+
+    def get_object(self, queryset=None):
+        # Fetched once, then shared by dispatch, context and template
+        if getattr(self, "object", None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
 
     def dispatch(self, request, *args, **kwargs):
-        self.question_id = kwargs["pk"]
-        question = Question.objects.get(pk=self.question_id)
-        if not question.is_published():
-            raise Http404("Question is unpublished")
-        if not question.can_vote():
-            return redirect("polls:results", pk=self.question_id)
+        self.object = None
+        question = self.get_object()
+        self.can_vote = question.can_vote()
+        if not self.can_vote:
+            return redirect("polls:results", pk=question.pk)
         return super(DetailsView, self).dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
-        question = Question.objects.get(pk=self.question_id)
         context = super().get_context_data(**kwargs)
+        context["can_vote"] = self.can_vote
+        question = self.object
         user = self.request.user
         if user.is_authenticated:
-            try:
-                selected_choice = VoteData.objects.get(
-                    user=user, choice__in=question.choice_set.all()
-                ).choice.choice_text
-                context["selected_choice"] = selected_choice
-            except VoteData.DoesNotExist:
-                pass  # Do nothing here, selected_choice is not set
+            if settings.POLLS_VOTE_BUFFER:
+                # Votes not written yet must be shown to their voter
+                context["selected_choice"] = (
+                    get_vote_buffer().pending_choice(user.id, question.id)
+                )
+            if context.get("selected_choice") is None:
+                context["selected_choice"] = (
+                    VoteData.objects.filter(user=user, question=question)
+                    .values_list("choice_id", flat=True)
+                    .first()
+                )
         return context
 
-    def get_queryset(self):
-        return Question.objects.filter(id__in=get_published())
-
 
 class ResultsView(generic.DetailView):
     """
@@ -112,13 +157,256 @@ class ResultsView(generic.DetailView):
 
     model = Question
     template_name = "polls/results.html"
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["total_votes"] = sum(
-            [c.vote_count for c in context["question"].choice_set.all()]
+        results = get_results(
+            self.object.id, self.object.status == Status.CLOSED
         )
+        user = self.request.user
+        if settings.POLLS_VOTE_BUFFER and user.is_authenticated:
+            # Voting redirects here, so votes not written yet are counted
+            results = get_vote_buffer().with_pending_vote(
+                results, user.id, self.object.id
+            )
+        context.update(results)
         return context
 
     def get_queryset(self):
-        return Question.objects.filter(id__in=get_published())
+        return Question.objects.published()
+
+
+@query_budget(11)
+@alogin_required
+async def avote(request, question_id):
+    """
+    Async version of vote(), for deployments served with ASGI.
+    Question and choice are looked up with the async ORM.
+
+    Namespace: polls:vote (when POLLS_ASYNC_VIEWS is enabled)
+
+    :param question_id: primary key id of question
+    """
+    try:
+        question = await Question.objects.aget(pk=question_id)
+    except Question.DoesNotExist:
+        raise Http404("Question does not exist")
+    try:
+        selected_choice = await question.choice_set.aget(
+            pk=request.POST["choice"]
+        )
+    except (KeyError, Choice.DoesNotExist):
+        await sync_to_async(messages.error)(
+            request, "You didn't choose a choice!"
+        )
+        return await sync_to_async(render)(
+            request,
+            "polls/details.html",
+            {"question": question},
+        )
+    if not question.can_vote():
+        await sync_to_async(messages.error)(
+            request, "Voting on this poll is closed."
+        )
+        return redirect("polls:results", pk=question_id)
+    user = await aget_user(request)
+    if settings.POLLS_VOTE_BUFFER:
+        await sync_to_async(get_vote_buffer().add)(
+            user.id, question.id, selected_choice.id
+        )
+    else:
+        await VoteData.objects.acast_vote(user, selected_choice)
+        await sync_to_async(notify_results_changed)(question.id)
+    return redirect("polls:results", pk=question_id)
+
+
+class AsyncDetailsView(generic.View):
+    """
+    Async version of DetailsView, for deployments served with ASGI.
+
+    Namespace: polls:details (when POLLS_ASYNC_VIEWS is enabled)
+    """
+
+    template_name = "polls/details.html"
+    query_budget = 5
+
+    async def get(self, request, pk):
+        try:
+            question = await Question.objects.prefetch_related(
+                "choice_set"
+            ).aget(pk=pk)
+        except Question.DoesNotExist:
+            raise Http404("Question does not exist")
+        if not question.is_published():
+            raise Http404("Question is unpublished")
+        if not question.can_vote():
+            return redirect("polls:results", pk=pk)
+        context = {"question": question, "object": question}
+        user = await aget_user(request)
+        if user.is_authenticated:
+            if settings.POLLS_VOTE_BUFFER:
+                context["selected_choice"] = (
+                    get_vote_buffer().pending_choice(user.id, question.id)
+                )
+            if context.get("selected_choice") is None:
+                context["selected_choice"] = (
+                    await VoteData.objects.filter(user=user, question=question)
+                    .values_list("choice_id", flat=True)
+                    .afirst()
+                )
+        # Rendering may load session messages, which is sync only
+        return await sync_to_async(render)(
+            request, self.template_name, context
+        )
+
+
+class AsyncResultsView(generic.View):
+    """
+    Async version of ResultsView, for deployments served with ASGI.
+
+    Namespace: polls:results (when POLLS_ASYNC_VIEWS is enabled)
+    """
+
+    template_name = "polls/results.html"
+    query_budget = 5
+
+    async def get(self, request, pk):
+        question = await Question.objects.published().filter(pk=pk).afirst()
+        if question is None:
+            raise Http404("Question does not exist")
+        context = {"question": question, "object": question}
+        results = await sync_to_async(get_results)(
+            question.id, question.status == Status.CLOSED
+        )
+        if settings.POLLS_VOTE_BUFFER:
+            user = await aget_user(request)
+            if user.is_authenticated:
+                results = await sync_to_async(
+                    get_vote_buffer().with_pending_vote
+                )(results, user.id, question.id)
+        context.update(results)
+        return await sync_to_async(render)(
+            request, self.template_name, context
+        )
+
+
+def results_etag(question, version):
+    """Returns a strong ETag for results of question at results version"""
+    state = "open" if question.can_vote() else "closed"
+    raw = (
+        f"{question.id}:{version}:{state}:{question.question_text}:"
+        f"{question.publish_date}:{question.end_date}"
+    )
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+@query_budget(2)
+@require_safe
+def results_api(request, pk):
+    """
+    Read-only JSON view of a poll's results, with per-choice counts,
+    total votes and poll state.
+
+    Namespace: polls:results_api
+
+    :param pk: primary key id of question
+
+    Responses carry an ETag built from the results version, so clients
+    sending If-None-Match get a 304 from a single question lookup.
+    """
+    try:
+        question = Question.objects.published().get(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404("Question does not exist")
+    etag = results_etag(question, get_results_version(question.id))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        return not_modified
+
+    data, version = get_versioned_results(
+        question.id, question.status == Status.CLOSED
+    )
+    response = JsonResponse(
+        {
+            "id": question.id,
+            "question_text": question.question_text,
+            "state": "open" if question.can_vote() else "closed",
+            "publish_date": question.publish_date,
+            "end_date": question.end_date,
+            "total_votes": data["total_votes"],
+            "choices": data["results"],
+        }
+    )
+    # Tag the results actually served, they may be stale while recomputing
+    response["ETag"] = results_etag(question, version)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+async def results_stream(request, pk):
+    """
+    Stream of a poll's results as Server-Sent Events, pushing the vote
+    counts that changed. Serve it with ASGI, idle streams then only wait
+    on the event loop. Under WSGI the current results are sent in one
+    event, and clients reconnect every POLLS_STREAM_POLL_INTERVAL.
+
+    Namespace: polls:results_stream
+
+    :param pk: primary key id of question
+    """
+    question = await Question.objects.published().filter(pk=pk).afirst()
+    if question is None:
+        raise Http404("Question does not exist")
+    closed = question.status == Status.CLOSED
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            stream_results(question.id, closed),
+            content_type="text/event-stream",
+        )
+    else:
+        # WSGI can't wait on the event loop, a stream would never end
+        event = await sync_to_async(results_event)(
+            question.id, closed, settings.POLLS_STREAM_POLL_INTERVAL
+        )
+        response = HttpResponse(event, content_type="text/event-stream")
+    response["X-Accel-Buffering"] = "no"  # Don't let proxies buffer events
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@query_budget(2)
+@staff_member_required
+@require_safe
+def export(request, kind, fmt):
+    """
+    Staff only download of raw votes or per-choice results, streamed as
+    CSV or JSON Lines.
+
+    Namespace: polls:export
+
+    :param kind: "votes" or "results"
+    :param fmt: "csv" or "jsonl"
+
+    Query parameters: question (id), since and until (publish date range
+    of questions) and state ("open", "closed" or "unpublished").
+    """
+    params = request.GET
+    try:
+        question = params.get("question")
+        header, rows = export_rows(
+            kind,
+            question=int(question) if question else None,
+            since=parse_when(params.get("since")),
+            until=parse_when(params.get("until"), end=True),
+            state=params.get("state") or None,
+        )
+        lines = iter_lines(header, rows, fmt)
+    except (InvalidFilter, ValueError) as e:
+        return HttpResponseBadRequest(str(e))
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = (
+        f'attachment; filename="{kind}.{fmt}"'
+    )
+    return response